@@ -0,0 +1,123 @@
+"""Categorization of statement rows, shared by the upload endpoints and the CLI"""
+from models import Expense
+from statement_parser import normalize_merchant, transaction_key, dedup_key
+
+# Smart categorization system
+SMART_CATEGORIES = {
+    "food": [
+        "migros", "bim", "a101", "şok", "carrefour", "metro", "real", "kipa", "lidl",
+        "market", "bakkal", "manav", "kasap", "fırın", "pastane", "cafe", "restaurant",
+        "restoran", "lokanta", "pizzeria", "döner", "kebap", "burger", "mcdonald",
+        "burger king", "kfc", "dominos", "pizza hut", "starbucks", "kahve dünyası",
+        "yemek", "food", "gıda", "et", "tavuk", "balık", "sebze", "meyve"
+    ],
+    "transport": [
+        "benzin", "petrol", "shell", "bp", "total", "opet", "petlas", "oto",
+        "taksi", "uber", "bitaksi", "otobüs", "metro", "dolmuş", "minibüs",
+        "uçak", "pegasus", "turkish airlines", "onur air", "tren", "tcdd",
+        "yakıt", "akaryakıt", "garaj", "otopark", "köprü", "geçiş", "hgs", "ogs"
+    ],
+    "shopping": [
+        "zara", "h&m", "mango", "koton", "lc waikiki", "defacto", "colin's",
+        "mavi", "beymen", "vakko", "boyner", "teknosa", "vatan", "media markt",
+        "btech", "apple store", "samsung", "amazon", "trendyol", "hepsiburada",
+        "gittigidiyor", "n11", "sahibinden", "dolap", "modanisa", "ayakkabı",
+        "giyim", "kıyafet", "elektronik", "telefon", "bilgisayar", "laptop"
+    ],
+    "entertainment": [
+        "sinema", "cinema", "cinemax", "cinemaximum", "akmerkez", "forum",
+        "netflix", "spotify", "apple music", "youtube", "gaming", "playstation",
+        "xbox", "steam", "google play", "app store", "tiyatro", "konser",
+        "müze", "aquarium", "lunapark", "bowling", "bilardo", "karaoke",
+        "eğlence", "oyun", "film", "müzik", "kitap", "dergi"
+    ],
+    "health": [
+        "hastane", "hospital", "doktor", "doctor", "eczane", "pharmacy", "sağlık",
+        "tıp", "medical", "diş", "dental", "göz", "eye", "kulak", "ear",
+        "jinekolog", "üroloji", "kardiyoloji", "nöroloji", "psikiyatri",
+        "fizik tedavi", "laboratuvar", "röntgen", "mri", "ameliyat", "ilaç",
+        "vitamin", "medikal", "klinik", "sağlık ocağı"
+    ],
+    "education": [
+        "okul", "school", "üniversite", "university", "kurs", "course", "eğitim",
+        "education", "kitap", "book", "kırtasiye", "kalem", "defter", "çanta",
+        "udemy", "coursera", "khan academy", "özel ders", "dershane", "etüt",
+        "sınav", "test", "ödev", "proje", "akademi", "enstitü", "kolej"
+    ],
+    "bills": [
+        "elektrik", "electric", "tedaş", "ayedaş", "bedaş", "su", "water", "aski",
+        "doğalgaz", "gas", "igdaş", "internet", "ttnet", "turkcell", "vodafone",
+        "türk telekom", "telefon", "phone", "fatura", "bill", "abonelik",
+        "netflix", "spotify", "apple", "google", "microsoft", "amazon prime",
+        "aidat", "apartman", "site", "yönetim", "kira", "rent"
+    ]
+}
+
+def smart_categorize(title, description=""):
+    """Automatically categorize expense based on title and description"""
+    text = f"{title} {description}".lower()
+    
+    # Score each category
+    category_scores = {}
+    for category, keywords in SMART_CATEGORIES.items():
+        score = 0
+        for keyword in keywords:
+            if keyword in text:
+                # Give higher score for exact matches
+                if keyword == text.strip():
+                    score += 10
+                # Give medium score for word matches
+                elif f" {keyword} " in f" {text} ":
+                    score += 5
+                # Give lower score for partial matches
+                elif keyword in text:
+                    score += 1
+        category_scores[category] = score
+    
+    # Return category with highest score, or 'other' if no match
+    if max(category_scores.values()) > 0:
+        return max(category_scores, key=category_scores.get)
+    return "other"
+
+def expense_doc_from_row(parsed: dict, valid_categories):
+    """Categorize a parsed statement row and build the expense document for it"""
+    title = parsed['title']
+    description = parsed['description']
+    
+    # Use provided category if valid, otherwise auto-categorize
+    category = parsed['category']
+    category_source = "statement"
+    if category not in valid_categories:
+        category = smart_categorize(title, description)
+        category_source = "auto"
+    
+    expense_obj = Expense(
+        title=title,
+        amount=parsed['amount'],
+        category=category,
+        description=description if description else None,
+        date=parsed['date']
+    )
+    expense_doc = expense_obj.dict()
+    expense_doc['created_at'] = expense_obj.created_at.isoformat()
+    expense_doc['merchant'] = normalize_merchant(title)
+    # Only guessed categories may later be replaced by recategorization
+    expense_doc['category_source'] = category_source
+    return expense_doc
+
+def statement_expense_doc(parsed: dict, valid_categories, import_id: str, row_number: int, occurrences: dict):
+    """Expense document for a row of an import, tagged with its import and dedup key.
+
+    occurrences counts transactions already seen in this file, so identical
+    rows within one statement get distinct keys.
+    """
+    expense_doc = expense_doc_from_row(parsed, valid_categories)
+    expense_doc['import_id'] = import_id
+    expense_doc['import_row'] = row_number
+    
+    # Same date, amount and merchant as an already stored row means
+    # the transaction came in through an overlapping statement
+    transaction = transaction_key(expense_doc['date'], expense_doc['amount'], expense_doc['merchant'])
+    occurrences[transaction] = occurrences.get(transaction, 0) + 1
+    expense_doc['dedup_key'] = dedup_key(transaction, occurrences[transaction])
+    return expense_doc
@@ -0,0 +1,593 @@
+"""Command-line tools that work on the configured MongoDB directly, bypassing the HTTP API.
+
+    python cli.py import-statements ./statements --workers 4
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import typer
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from models import EXPENSE_CATEGORIES, VALID_CATEGORY_IDS
+from data_version import bump_external_version
+from categorization import smart_categorize, statement_expense_doc
+from forecasting import FORECAST_MODELS, build_month_matrix, month_range, rolling_origin_backtest
+from statement_parser import (
+    SUPPORTED_EXTENSIONS, read_statement, detect_statement_format, normalize_merchant,
+    transaction_key, dedup_key, split_dedup_key, infer_date_format, DATE_SAMPLE_ROWS
+)
+
+app = typer.Typer(help="Expense tracker command-line tools")
+
+DEFAULT_INSERT_BATCH_SIZE = 1000
+DEFAULT_MAINTENANCE_BATCH_SIZE = 1000
+# Expenses whose date does not start with YYYY-MM are processed as one extra partition
+MONTH_PATTERN = re.compile(r"^\d{4}-\d{2}")
+UNDATED_PARTITION = "undated"
+
+
+@app.callback()
+def main():
+    """Expense tracker command-line tools"""
+
+
+def parse_statement_file(path: str, import_id: str):
+    """Read, clean and categorize one statement in a worker process.
+
+    Rows come back as (row_number, doc) pairs ready for insert_new_expenses.
+    """
+    with open(path, 'rb') as f:
+        contents = f.read()
+    df = read_statement(contents, path)
+    parser = detect_statement_format(df)
+
+    occurrences = {}
+    rows = []
+    errors = []
+    filtered = 0
+    for index, values in parser.iter_rows(df):
+        row_number = index + 1
+        try:
+            parsed = parser.parse_row(values)
+            if parsed is None:
+                filtered += 1
+                continue
+            rows.append((row_number, statement_expense_doc(parsed, VALID_CATEGORY_IDS, import_id, row_number, occurrences)))
+        except Exception as e:
+            errors.append({"import_id": import_id, "kind": "error", "row": row_number, "message": f"Row {row_number}: {e}"})
+
+    return {
+        "total_rows": len(df),
+        "rows": rows,
+        "errors": errors,
+        "filtered": filtered,
+        "detected_columns": parser.column_mapping,
+        "detected_format": parser.profile.name
+    }
+
+
+async def import_statement_file(server, pool, path: Path, content_hash: str, batch_size: int):
+    """Parse a statement in the pool, then insert its rows and record the import like the API does"""
+    import_id = str(uuid.uuid4())
+    loop = asyncio.get_running_loop()
+    parsed = await loop.run_in_executor(pool, parse_statement_file, str(path), import_id)
+
+    await server.db.imports.insert_one({
+        "id": import_id,
+        "filename": path.name,
+        "content_hash": content_hash,
+        "size": path.stat().st_size,
+        "status": "running",
+        "checkpoint_row": 0,
+        "created_at": datetime.utcnow().isoformat(),
+        "heartbeat_at": datetime.utcnow().isoformat()
+    })
+
+    try:
+        imported = 0
+        categories_assigned = {}
+        duplicates = []
+        rows = parsed["rows"]
+        errors = parsed["errors"]
+        errors_stored = 0
+        for start in range(0, len(rows), batch_size):
+            inserted, skipped = await server.insert_new_expenses(rows[start:start + batch_size])
+            imported += len(inserted)
+            for _, doc in inserted:
+                server.track_category(categories_assigned, doc['category'], doc['title'])
+            batch_duplicates = [
+                {"row": row, "title": doc['title'], "amount": doc['amount'], "date": doc['date']}
+                for row, doc in skipped
+            ]
+            duplicates += batch_duplicates
+
+            # Every row before the next parsed one is done, so a resume may start after it
+            next_start = start + batch_size
+            checkpoint_row = rows[next_start][0] - 1 if next_start < len(rows) else parsed["total_rows"]
+            batch_errors = [issue for issue in errors[errors_stored:] if issue["row"] <= checkpoint_row]
+            errors_stored += len(batch_errors)
+            issues = batch_errors + [{"import_id": import_id, "kind": "duplicate", **dup} for dup in batch_duplicates]
+            if issues:
+                await server.db.import_issues.insert_many(issues)
+            # Checkpoint like the API does, so the record never looks abandoned while rows are written
+            await server.db.imports.update_one(
+                {"id": import_id},
+                {"$set": {
+                    "checkpoint_row": checkpoint_row,
+                    "counters": {
+                        "imported": imported,
+                        "duplicates_skipped": len(duplicates),
+                        "filtered": checkpoint_row - imported - len(duplicates) - errors_stored,
+                        "errors": errors_stored,
+                        "categories": {cat: entry["count"] for cat, entry in categories_assigned.items()}
+                    },
+                    "heartbeat_at": datetime.utcnow().isoformat()
+                }}
+            )
+
+        if errors[errors_stored:]:
+            await server.db.import_issues.insert_many(errors[errors_stored:])
+    except Exception as e:
+        # A stale record is resumed by the next API upload of the same file
+        await server.db.imports.update_one(
+            {"id": import_id},
+            {"$set": {"status": "failed", "error": str(e)}}
+        )
+        raise
+
+    result = {
+        "message": f"Successfully imported {imported} expenses",
+        "total_rows": parsed["total_rows"],
+        "imported": imported,
+        "resumed_from_row": 0,
+        "duplicates_skipped": len(duplicates),
+        "duplicates": duplicates[:server.SUMMARY_SAMPLE_SIZE],
+        "error_count": len(parsed["errors"]),
+        "errors": [issue["message"] for issue in parsed["errors"][:server.SUMMARY_SAMPLE_SIZE]],
+        "auto_categorization": categories_assigned,
+        "detected_columns": parsed["detected_columns"],
+        "detected_format": parsed["detected_format"],
+        "details_url": f"/api/imports/{import_id}/rows"
+    }
+    await server.db.imports.update_one(
+        {"id": import_id},
+        {"$set": {
+            "status": "completed",
+            "checkpoint_row": parsed["total_rows"],
+            "result": result,
+            "completed_at": datetime.utcnow().isoformat()
+        }}
+    )
+    return result
+
+
+async def import_directory(directory: Path, workers: int, batch_size: int, force: bool):
+    # Imported here so spawned parser processes never open MongoDB connections
+    import server
+
+    paths = sorted(
+        path for path in directory.rglob('*')
+        if path.is_file() and not path.name.startswith('.') and path.suffix.lower() in SUPPORTED_EXTENSIONS
+    )
+    if not paths:
+        typer.echo(f"No statements ({', '.join(SUPPORTED_EXTENSIONS)}) found in {directory}")
+        raise typer.Exit(code=1)
+
+    await server.create_indexes()
+    started = time.monotonic()
+    total_rows = 0
+    total_imported = 0
+    failed = 0
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        jobs = {}
+        for path in paths:
+            content_hash = hashlib.sha256(path.read_bytes()).hexdigest()
+            if not force:
+                previous = await server.find_previous_import(content_hash)
+                if previous:
+                    typer.echo(f"{path}: already imported on {previous['created_at']}, skipped")
+                    continue
+            job = asyncio.ensure_future(import_statement_file(server, pool, path, content_hash, batch_size))
+            jobs[job] = path
+
+        pending = set(jobs)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for job in done:
+                path = jobs[job]
+                try:
+                    result = job.result()
+                except Exception as e:
+                    failed += 1
+                    typer.echo(f"{path}: failed: {e}", err=True)
+                    continue
+                total_rows += result["total_rows"]
+                total_imported += result["imported"]
+                typer.echo(
+                    f"{path}: {result['imported']} imported, {result['duplicates_skipped']} duplicates, "
+                    f"{result['error_count']} errors ({result['detected_format']})"
+                )
+
+    # Lets a running API drop its cached responses
+    await bump_external_version(server.db.meta)
+    elapsed = time.monotonic() - started
+    rate = total_rows / elapsed if elapsed > 0 else 0
+    typer.echo(
+        f"Imported {total_imported} expenses from {total_rows} rows in {elapsed:.1f}s "
+        f"({rate:.0f} rows/sec), {failed} files failed"
+    )
+    server.client.close()
+
+
+@app.command("import-statements")
+def import_statements(
+    directory: Path = typer.Argument(..., exists=True, file_okay=False, help="Directory searched recursively for statements"),
+    workers: int = typer.Option(os.cpu_count() or 1, help="Parser processes"),
+    batch_size: int = typer.Option(DEFAULT_INSERT_BATCH_SIZE, help="Expenses per insert_many"),
+    force: bool = typer.Option(False, help="Import files even if the same content was imported before"),
+):
+    """Import every CSV, Excel and PDF statement under a directory into MONGO_URL/DB_NAME."""
+    asyncio.run(import_directory(directory, max(1, workers), max(1, batch_size), force))
+
+
+def recategorized_fields(doc):
+    return {"category": smart_categorize(doc.get('title', ''), doc.get('description') or ""), "category_source": "auto"}
+
+
+def merchant_fields(doc):
+    merchant = normalize_merchant(doc.get('title', ''))
+    fields = {"merchant": merchant}
+    # The dedup key embeds the merchant, so it has to follow or overlapping statements stop matching
+    if doc.get('dedup_key'):
+        _, occurrence = split_dedup_key(doc['dedup_key'])
+        fields["dedup_key"] = dedup_key(transaction_key(doc['date'], doc['amount'], merchant), occurrence)
+    return fields
+
+
+def partition_query(month: str):
+    if month == UNDATED_PARTITION:
+        return {"date": {"$not": MONTH_PATTERN}}
+    # An anchored prefix regex can use the date index
+    return {"date": {"$regex": f"^{re.escape(month)}"}}
+
+
+async def expense_months(db, scope: dict):
+    dates = await db.expenses.distinct("date", scope)
+    months = {date[:7] for date in dates if isinstance(date, str) and MONTH_PATTERN.match(date)}
+    if await db.expenses.count_documents({**scope, **partition_query(UNDATED_PARTITION)}, limit=1):
+        months.add(UNDATED_PARTITION)
+    return sorted(months)
+
+
+async def rebuild_partition(db, run_id: str, month: str, scope: dict, compute, projection: dict, batch_size: int, last_id=None):
+    """Stream one month of expenses in _id order and write changed fields with bulk_write.
+
+    The last processed _id is checkpointed after every batch, so a rerun
+    continues where this one stopped.
+    """
+    query = {**scope, **partition_query(month)}
+    if last_id is not None:
+        query["_id"] = {"$gt": last_id}
+
+    scanned = 0
+    updated = 0
+    conflicts = 0
+    # (_id, changed fields) of the updates not written yet
+    pending = []
+
+    async def flush():
+        nonlocal updated, conflicts
+        if pending:
+            operations = [UpdateOne({"_id": doc_id}, {"$set": changed}) for doc_id, changed in pending]
+            try:
+                result = await db.expenses.bulk_write(operations, ordered=False)
+                updated += result.modified_count
+            except BulkWriteError as e:
+                updated += e.details.get('nModified', 0)
+                duplicates = [error['index'] for error in e.details['writeErrors'] if error.get('code') == 11000]
+                if len(duplicates) != len(e.details['writeErrors']):
+                    raise
+                # A recomputed dedup_key that is already taken means the two rows are now
+                # recognised as the same transaction; keep the old key and update the rest
+                conflicts += len(duplicates)
+                retries = []
+                for index in duplicates:
+                    doc_id, changed = pending[index]
+                    fields = {name: value for name, value in changed.items() if name != "dedup_key"}
+                    if fields:
+                        retries.append(UpdateOne({"_id": doc_id}, {"$set": fields}))
+                if retries:
+                    updated += (await db.expenses.bulk_write(retries, ordered=False)).modified_count
+            pending.clear()
+        await db.maintenance_runs.update_one(
+            {"id": run_id},
+            {"$set": {f"checkpoints.{month}": last_id, "heartbeat_at": datetime.utcnow().isoformat()}}
+        )
+
+    cursor = db.expenses.find(query, projection).sort("_id", 1).batch_size(batch_size)
+    async for doc in cursor:
+        scanned += 1
+        last_id = doc['_id']
+        fields = compute(doc)
+        changed = {name: value for name, value in fields.items() if doc.get(name) != value}
+        if changed:
+            pending.append((doc['_id'], changed))
+        if scanned % batch_size == 0:
+            await flush()
+    await flush()
+
+    await db.maintenance_runs.update_one({"id": run_id}, {"$addToSet": {"completed_partitions": month}})
+    return scanned, updated, conflicts
+
+
+async def run_maintenance(task: str, compute, projection: dict, scope: dict, parallel: int, batch_size: int, restart: bool):
+    """Recompute derived fields month by month, resuming an unfinished run of the same task"""
+    # server opens a MongoDB client on import, so commands that need it import it themselves
+    import server
+    db = server.db
+
+    await server.create_indexes()
+    run = None if restart else await db.maintenance_runs.find_one({"task": task, "status": "running"})
+    if run is None:
+        await db.maintenance_runs.update_many({"task": task, "status": "running"}, {"$set": {"status": "abandoned"}})
+        run = {
+            "id": str(uuid.uuid4()),
+            "task": task,
+            "status": "running",
+            "completed_partitions": [],
+            "checkpoints": {},
+            "started_at": datetime.utcnow().isoformat()
+        }
+        await db.maintenance_runs.insert_one(dict(run))
+    else:
+        typer.echo(f"Resuming {task} started at {run['started_at']}")
+
+    months = [month for month in await expense_months(db, scope) if month not in run["completed_partitions"]]
+    started = time.monotonic()
+    workers = asyncio.Semaphore(parallel)
+    totals = {"scanned": 0, "updated": 0, "conflicts": 0}
+
+    async def process(month):
+        async with workers:
+            scanned, updated, conflicts = await rebuild_partition(
+                db, run["id"], month, scope, compute, projection, batch_size,
+                last_id=run["checkpoints"].get(month)
+            )
+        totals["scanned"] += scanned
+        totals["updated"] += updated
+        totals["conflicts"] += conflicts
+        typer.echo(f"{month}: {scanned} scanned, {updated} updated")
+
+    await asyncio.gather(*(process(month) for month in months))
+    await bump_external_version(db.meta)
+    await db.maintenance_runs.update_one(
+        {"id": run["id"]},
+        {"$set": {"status": "completed", "completed_at": datetime.utcnow().isoformat()}}
+    )
+
+    elapsed = time.monotonic() - started
+    rate = totals["scanned"] / elapsed if elapsed > 0 else 0
+    typer.echo(
+        f"{task}: {totals['scanned']} expenses scanned, {totals['updated']} updated "
+        f"across {len(months)} months in {elapsed:.1f}s ({rate:.0f} rows/sec)"
+    )
+    if totals["conflicts"]:
+        typer.echo(f"{totals['conflicts']} expenses kept their old dedup_key because the new one belongs to another expense")
+    server.client.close()
+
+
+@app.command("recategorize")
+def recategorize(
+    include_manual: bool = typer.Option(False, help="Also overwrite categories picked by the user or taken from the statement"),
+    parallel: int = typer.Option(4, help="Months processed at the same time"),
+    batch_size: int = typer.Option(DEFAULT_MAINTENANCE_BATCH_SIZE, help="Updates per bulk_write"),
+    restart: bool = typer.Option(False, help="Start over instead of resuming an unfinished run"),
+):
+    """Re-run smart categorization over stored expenses, e.g. after the keyword rules changed."""
+    # Only categories smart_categorize guessed at import time; user choices and
+    # statement categories are kept unless explicitly included
+    scope = {} if include_manual else {"category_source": "auto"}
+    projection = {"_id": 1, "title": 1, "description": 1, "category": 1}
+    asyncio.run(run_maintenance(
+        "recategorize-all" if include_manual else "recategorize",
+        recategorized_fields, projection, scope, max(1, parallel), max(1, batch_size), restart
+    ))
+
+
+@app.command("recompute-merchants")
+def recompute_merchants(
+    parallel: int = typer.Option(4, help="Months processed at the same time"),
+    batch_size: int = typer.Option(DEFAULT_MAINTENANCE_BATCH_SIZE, help="Updates per bulk_write"),
+    restart: bool = typer.Option(False, help="Start over instead of resuming an unfinished run"),
+):
+    """Recompute the normalized merchant of every expense from its title, and the dedup key built from it."""
+    projection = {"_id": 1, "title": 1, "merchant": 1, "date": 1, "amount": 1, "dedup_key": 1}
+    asyncio.run(run_maintenance(
+        "recompute-merchants", merchant_fields, projection, {}, max(1, parallel), max(1, batch_size), restart
+    ))
+
+
+async def measure_updates(collection, ids, concurrency: int, update):
+    """Run update(collection, id) for every id with bounded concurrency; returns latencies in ms"""
+    workers = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def timed(expense_id):
+        async with workers:
+            started = time.perf_counter()
+            await update(collection, expense_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(timed(expense_id) for expense_id in ids))
+    return sorted(latencies)
+
+
+async def update_in_three_round_trips(collection, expense_id):
+    # What update_expense used to do: read, write, read back
+    await collection.find_one({"id": expense_id})
+    await collection.update_one({"id": expense_id}, {"$set": {"category": "food"}})
+    await collection.find_one({"id": expense_id})
+
+
+async def update_in_one_round_trip(collection, expense_id):
+    await collection.find_one_and_update(
+        {"id": expense_id},
+        {"$set": {"category": "shopping"}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def benchmark_updates(count: int, concurrency: int):
+    import server
+
+    # A scratch collection, so real expenses are never touched
+    collection = server.db.bench_expenses
+    await collection.drop()
+    await collection.create_index("id")
+    ids = [str(uuid.uuid4()) for _ in range(count)]
+    await collection.insert_many([
+        {"id": expense_id, "title": "Benchmark", "amount": 1.0, "category": "other", "date": "2024-01-01"}
+        for expense_id in ids
+    ])
+
+    try:
+        results = {}
+        for name, update in (("find_one + update_one + find_one", update_in_three_round_trips),
+                             ("find_one_and_update", update_in_one_round_trip)):
+            latencies = await measure_updates(collection, ids, concurrency, update)
+            results[name] = latencies
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            typer.echo(f"{name}: mean {sum(latencies) / len(latencies):.2f} ms, p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+        old, new = (sum(latencies) / len(latencies) for latencies in results.values())
+        typer.echo(f"Mean latency ratio: {new / old:.2f}")
+    finally:
+        await collection.drop()
+        server.client.close()
+
+
+@app.command("bench-updates")
+def bench_updates(
+    count: int = typer.Option(2000, help="Updates per variant"),
+    concurrency: int = typer.Option(50, help="Updates in flight at the same time"),
+):
+    """Compare per-update latency of the old three-round-trip update with find_one_and_update."""
+    asyncio.run(benchmark_updates(max(1, count), max(1, concurrency)))
+
+
+def dataset_monthly_totals(path: Path):
+    """Month × category totals of a CSV or Excel file with date, amount and category columns"""
+    import pandas as pd
+
+    frame = pd.read_excel(path) if path.suffix.lower() in (".xls", ".xlsx") else pd.read_csv(path)
+    frame.columns = [str(column).strip().lower() for column in frame.columns]
+    missing = {"date", "amount", "category"} - set(frame.columns)
+    if missing:
+        raise typer.BadParameter(f"{path} has no {', '.join(sorted(missing))} column")
+    # Dates are read like imports read them: day-first unless the column says otherwise
+    if pd.api.types.is_datetime64_any_dtype(frame["date"]):
+        dates = frame["date"]
+    else:
+        values = frame["date"].astype(str).str.strip()
+        date_format = infer_date_format(values[frame["date"].notna()].head(DATE_SAMPLE_ROWS).tolist())
+        if date_format:
+            dates = pd.to_datetime(values, format=date_format, errors="coerce")
+        else:
+            dates = pd.to_datetime(values, format="mixed", dayfirst=True, errors="coerce")
+    frame["month"] = dates.dt.strftime("%Y-%m")
+    unparsed = int(frame["month"].isna().sum())
+    if unparsed:
+        typer.echo(f"Skipping {unparsed} rows whose date could not be read")
+    totals = frame.dropna(subset=["month"]).groupby(["month", "category"])["amount"].sum()
+    return [{"_id": {"month": month, "category": category}, "total": total} for (month, category), total in totals.items()]
+
+
+async def stored_monthly_totals():
+    """Month × category totals of the stored expenses, leaving out the current, incomplete month"""
+    import server
+
+    current_month = datetime.utcnow().strftime("%Y-%m")
+    rows = await server.db.expenses.aggregate([
+        {"$group": {
+            "_id": {"month": {"$substr": ["$date", 0, 7]}, "category": "$category"},
+            "total": {"$sum": "$amount"}
+        }}
+    ]).to_list(None)
+    server.client.close()
+    return [
+        row for row in rows
+        if MONTH_PATTERN.match(row["_id"]["month"] or "") and row["_id"]["month"] < current_month
+    ]
+
+
+@app.command("backtest")
+def backtest(
+    dataset: Path = typer.Option(None, exists=True, dir_okay=False, help="CSV or Excel file with date, amount and category columns; defaults to the stored expenses"),
+    models: str = typer.Option(",".join(FORECAST_MODELS), help="Comma separated models to compare"),
+    horizon: int = typer.Option(2, help="Months ahead to forecast; the endpoint forecasts 2 (next month)"),
+    min_train_months: int = typer.Option(6, help="History required before the first forecast origin"),
+):
+    """Replay past months with rolling-origin forecasts and report MAE, MAPE and runtime per model."""
+    names = [name.strip() for name in models.split(",") if name.strip()]
+    unknown = [name for name in names if name not in FORECAST_MODELS]
+    if unknown:
+        raise typer.BadParameter(f"Unknown model {', '.join(unknown)}; choose from {', '.join(FORECAST_MODELS)}")
+    horizon = max(1, horizon)
+
+    rows = dataset_monthly_totals(dataset) if dataset else asyncio.run(stored_monthly_totals())
+    if not rows:
+        typer.echo("No dated expenses to backtest on")
+        raise typer.Exit(1)
+    months_seen = sorted({row["_id"]["month"] for row in rows})
+    first, last = months_seen[0], months_seen[-1]
+    month_count = (int(last[:4]) - int(first[:4])) * 12 + int(last[5:7]) - int(first[5:7]) + 1
+    months = month_range(last, month_count)
+    names_by_id = {cat["id"]: cat["name"] for cat in EXPENSE_CATEGORIES}
+    categories = sorted({row["_id"]["category"] for row in rows}, key=str)
+    matrix = build_month_matrix(rows, categories, months)
+    origins = month_count - horizon - max(1, min_train_months) + 1
+    if origins < 1:
+        typer.echo(f"{month_count} months of history is too short for {min_train_months} training months and horizon {horizon}")
+        raise typer.Exit(1)
+    typer.echo(f"{len(categories)} categories, {first} to {last}, {origins} forecast origins, horizon {horizon}")
+
+    results = {name: rolling_origin_backtest(matrix, FORECAST_MODELS[name], horizon, max(1, min_train_months)) for name in names}
+
+    typer.echo("")
+    typer.echo(f"{'category':<28}" + "".join(f"{name:>26}" for name in names))
+    typer.echo(f"{'':<28}" + "".join(f"{'MAE':>14}{'MAPE':>12}" for _ in names))
+    for i, category in enumerate(categories):
+        cells = ""
+        for result in results.values():
+            mae, mape = result["mae"][i], result["mape"][i]
+            cells += (f"{'-':>14}" if np.isnan(mae) else f"{mae:>14.2f}") + (f"{'-':>12}" if np.isnan(mape) else f"{mape:>11.1f}%")
+        typer.echo(f"{str(names_by_id.get(category, category))[:27]:<28}{cells}")
+
+    typer.echo("")
+    for name, result in results.items():
+        scored = result["scored"] > 0
+        # Overall MAE weights each category by how many forecasts it was scored on
+        mae = np.average(result["mae"][scored], weights=result["scored"][scored]) if scored.any() else np.nan
+        mape = np.nanmean(result["mape"]) if not np.isnan(result["mape"]).all() else np.nan
+        runtimes = result["runtimes_ms"]
+        typer.echo(
+            f"{name}: MAE {mae:.2f}, mean MAPE {mape:.1f}%, "
+            f"{runtimes.mean():.3f} ms per forecast (p95 {np.percentile(runtimes, 95):.3f} ms)"
+        )
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,73 @@
+"""Data version: a counter bumped after every write, used to build ETags for GET responses"""
+import asyncio
+import hashlib
+import logging
+import uuid
+
+# How often the API picks up writes made by other processes, e.g. the CLI
+EXTERNAL_POLL_SECONDS = 2
+DATA_VERSION_ID = "data_version"
+
+logger = logging.getLogger(__name__)
+
+
+class DataVersion:
+    """Monotonic version of everything the read endpoints return.
+
+    local counts writes made by this process. external mirrors a counter
+    in MongoDB that out-of-process writers (the CLI) increment; it is
+    polled in the background so checking the version never needs a query.
+    The epoch differs per process start, so ETags handed out before a
+    restart never match.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:12]
+        self.local = 0
+        self.external = 0
+        self._task = None
+
+    def bump(self):
+        self.local += 1
+
+    def token(self):
+        return f"{self.epoch}.{self.local}.{self.external}"
+
+    def etag(self, *parts):
+        """Weak ETag for the current version and whatever identifies the response"""
+        digest = hashlib.sha1(self.token().encode())
+        for part in parts:
+            digest.update(b"\0" + str(part).encode())
+        return f'W/"{digest.hexdigest()[:20]}"'
+
+    async def refresh_external(self, collection):
+        doc = await collection.find_one({"_id": DATA_VERSION_ID})
+        self.external = doc["value"] if doc else 0
+
+    def start_watching(self, collection):
+        self._task = asyncio.create_task(self._watch(collection))
+
+    async def stop_watching(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _watch(self, collection):
+        while True:
+            try:
+                await self.refresh_external(collection)
+            except Exception as e:
+                logger.warning("Could not refresh external data version: %s", e)
+            await asyncio.sleep(EXTERNAL_POLL_SECONDS)
+
+
+data_version = DataVersion()
+
+
+async def bump_external_version(collection):
+    """Called by writers outside the API process so its ETags change too"""
+    await collection.update_one({"_id": DATA_VERSION_ID}, {"$inc": {"value": 1}}, upsert=True)
@@ -0,0 +1,190 @@
+"""Monthly spending forecasts for all categories at once, on a category × month NumPy matrix"""
+from dataclasses import dataclass
+
+import time
+
+import numpy as np
+
+# Smoothing factors tried per category; the one with the lowest one-step error wins
+ALPHA_GRID = np.linspace(0.1, 0.9, 9)
+SEASON_LENGTH = 12
+# Two full seasons are needed before seasonal naive is considered
+MIN_SEASONAL_MONTHS = 2 * SEASON_LENGTH
+INTERVAL_Z = {80: 1.2816, 90: 1.6449, 95: 1.9600}
+
+
+@dataclass
+class Forecast:
+    """Per-category forecast for one horizon; every field is indexed like the matrix rows"""
+    point: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+    method: np.ndarray
+    alpha: np.ndarray
+    history_mean: np.ndarray
+    observed_months: np.ndarray
+    level: int
+
+
+def shift_month(month_key: str, offset: int) -> str:
+    """'YYYY-MM' moved by offset months"""
+    index = int(month_key[:4]) * 12 + int(month_key[5:7]) - 1 + offset
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def month_range(last_month: str, count: int):
+    """The count consecutive months ending with last_month, oldest first"""
+    return [shift_month(last_month, offset) for offset in range(1 - count, 1)]
+
+
+def build_month_matrix(rows, categories, months):
+    """Category × month matrix of totals from {_id: {month, category}, total} aggregation rows"""
+    category_index = {category: i for i, category in enumerate(categories)}
+    month_index = {month: j for j, month in enumerate(months)}
+    matrix = np.zeros((len(categories), len(months)))
+    for row in rows:
+        i = category_index.get(row['_id'].get('category'))
+        j = month_index.get(row['_id'].get('month'))
+        if i is not None and j is not None:
+            matrix[i, j] += row['total']
+    return matrix
+
+
+def _smoothing(matrix, started):
+    """Simple exponential smoothing of every row for every alpha in ALPHA_GRID.
+
+    Each row starts at its first month with spending; leading empty months
+    are not treated as zero spending. Returns the final level, the one-step
+    RMSE and the chosen alpha per row.
+    """
+    rows, months = matrix.shape
+    best_rmse = np.full(rows, np.inf)
+    best_level = np.zeros(rows)
+    best_alpha = np.full(rows, np.nan)
+    for alpha in ALPHA_GRID:
+        level = np.full(rows, np.nan)
+        sse = np.zeros(rows)
+        errors = np.zeros(rows)
+        for t in range(months):
+            y = matrix[:, t]
+            has_level = ~np.isnan(level)
+            error = np.where(has_level, y - np.nan_to_num(level), 0.0)
+            sse += error ** 2
+            errors += has_level
+            level = np.where(has_level, level + alpha * error, np.where(started[:, t], y, np.nan))
+        rmse = np.where(errors > 0, np.sqrt(sse / np.maximum(errors, 1)), np.inf)
+        better = rmse < best_rmse
+        best_rmse = np.where(better, rmse, best_rmse)
+        best_level = np.where(better, np.nan_to_num(level), best_level)
+        best_alpha = np.where(better, alpha, best_alpha)
+    # A row first seen in the last month has no one-step error for any alpha;
+    # its level is simply that month's value
+    best_level = np.where(np.isfinite(best_rmse), best_level, np.nan_to_num(level))
+    return best_level, best_rmse, best_alpha
+
+
+def forecast_matrix(matrix, horizon: int = 1, level: int = 80, seasonal: bool = True) -> Forecast:
+    """Forecast the month horizon steps after the last column of matrix, for every row.
+
+    Rows use simple exponential smoothing, or seasonal naive (same month last
+    year) when there are two full years of history and it had the lower
+    in-sample error. Intervals assume normally distributed one-step errors.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    rows, months = matrix.shape
+    z = INTERVAL_Z[level]
+    started = np.cumsum(matrix > 0, axis=1) > 0
+    observed_months = started.sum(axis=1)
+    history_mean = np.where(
+        observed_months > 0,
+        np.where(started, matrix, 0.0).sum(axis=1) / np.maximum(observed_months, 1),
+        0.0
+    )
+
+    point, rmse, alpha = _smoothing(matrix, started)
+    # The SES h-step error variance grows with (1 + (h - 1) * alpha^2)
+    spread = rmse * np.sqrt(1 + (horizon - 1) * np.nan_to_num(alpha) ** 2)
+    method = np.full(rows, "exponential_smoothing", dtype=object)
+
+    if seasonal and months >= MIN_SEASONAL_MONTHS:
+        lagged = started[:, :-SEASON_LENGTH]
+        seasonal_errors = np.where(lagged, matrix[:, SEASON_LENGTH:] - matrix[:, :-SEASON_LENGTH], 0.0)
+        counts = lagged.sum(axis=1)
+        seasonal_rmse = np.where(counts > 0, np.sqrt((seasonal_errors ** 2).sum(axis=1) / np.maximum(counts, 1)), np.inf)
+        # Same calendar month one season before the target
+        seasons_back = (horizon - 1) // SEASON_LENGTH + 1
+        source = months - 1 + horizon - seasons_back * SEASON_LENGTH
+        use_seasonal = (seasonal_rmse < rmse) & started[:, source]
+        point = np.where(use_seasonal, matrix[:, source], point)
+        spread = np.where(use_seasonal, seasonal_rmse * np.sqrt(seasons_back), spread)
+        method = np.where(use_seasonal, "seasonal_naive", method)
+
+    # With a single observed month there is no error estimate; allow ±100%
+    spread = np.where(np.isfinite(spread), spread, point)
+    return Forecast(
+        point=point,
+        lower=np.maximum(point - z * spread, 0.0),
+        upper=point + z * spread,
+        method=method,
+        alpha=alpha,
+        history_mean=history_mean,
+        observed_months=observed_months,
+        level=level
+    )
+
+
+def seasonal_naive_forecast(matrix, horizon: int = 1):
+    """Same calendar month one season earlier; the last month when there is less history"""
+    matrix = np.asarray(matrix, dtype=float)
+    seasons_back = (horizon - 1) // SEASON_LENGTH + 1
+    source = matrix.shape[1] - 1 + horizon - seasons_back * SEASON_LENGTH
+    return matrix[:, source] if source >= 0 else matrix[:, -1]
+
+
+def recent_average_forecast(matrix, horizon: int = 1, window: int = 3, growth: float = 1.1):
+    """Average of the last window months plus a flat growth factor, the original predictions rule"""
+    return np.asarray(matrix, dtype=float)[:, -window:].mean(axis=1) * growth
+
+
+# Point forecasters compared by the backtest; each takes (matrix, horizon)
+FORECAST_MODELS = {
+    "auto": lambda matrix, horizon: forecast_matrix(matrix, horizon).point,
+    "exponential_smoothing": lambda matrix, horizon: forecast_matrix(matrix, horizon, seasonal=False).point,
+    "seasonal_naive": seasonal_naive_forecast,
+    "recent_average": recent_average_forecast,
+}
+
+
+def rolling_origin_backtest(matrix, model, horizon: int = 1, min_train_months: int = 6):
+    """Refit model at every origin and score its forecast horizon months ahead.
+
+    Only categories with spending before an origin are scored there. MAPE
+    skips months whose actual total was zero. Returns per-row MAE, MAPE and
+    scored counts, plus the runtime of every forecast in milliseconds.
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    rows, months = matrix.shape
+    abs_error = np.zeros(rows)
+    pct_error = np.zeros(rows)
+    scored = np.zeros(rows, dtype=int)
+    pct_scored = np.zeros(rows, dtype=int)
+    runtimes = []
+    for origin in range(min_train_months, months - horizon + 1):
+        train = matrix[:, :origin]
+        actual = matrix[:, origin + horizon - 1]
+        started = time.perf_counter()
+        predicted = np.asarray(model(train, horizon), dtype=float)
+        runtimes.append((time.perf_counter() - started) * 1000)
+        active = train.any(axis=1)
+        error = np.abs(predicted - actual)
+        abs_error += np.where(active, error, 0.0)
+        scored += active
+        has_actual = active & (actual > 0)
+        pct_error += np.where(has_actual, error / np.where(actual > 0, actual, 1.0), 0.0)
+        pct_scored += has_actual
+    return {
+        "mae": np.where(scored > 0, abs_error / np.maximum(scored, 1), np.nan),
+        "mape": np.where(pct_scored > 0, 100 * pct_error / np.maximum(pct_scored, 1), np.nan),
+        "scored": scored,
+        "runtimes_ms": np.array(runtimes)
+    }
@@ -0,0 +1,93 @@
+"""Group commit: concurrent writes are queued and flushed together in batches"""
+import asyncio
+
+# Queued after the last item on shutdown; the writer flushes everything before it and stops
+_STOP = object()
+
+
+class GroupCommitBuffer:
+    """Collects items from concurrent callers and writes them with one call per batch.
+
+    A batch is flushed when it reaches max_batch_size items or max_delay
+    seconds after its first item arrived. submit() returns once the batch
+    holding the item was written, so callers are only acknowledged after
+    the write succeeded. The queue holds at most max_pending items;
+    further submits wait for room, which slows producers down instead of
+    letting the buffer grow without bound.
+    """
+
+    def __init__(self, write_batch, max_batch_size=500, max_delay=0.005, max_pending=10000):
+        self.write_batch = write_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.batches_written = 0
+        self.items_written = 0
+        self._queue = None
+        self._task = None
+        self._closing = False
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, item):
+        if not self.running or self._closing:
+            raise RuntimeError("Group commit buffer is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        await future
+
+    async def close(self):
+        """Flush everything queued so far and stop the writer"""
+        if not self.running:
+            return
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._task
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                break
+            batch = [entry]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                try:
+                    entry = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        entry = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        items = [item for item, _ in batch]
+        try:
+            await self.write_batch(items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches_written += 1
+        self.items_written += len(items)
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
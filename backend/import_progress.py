@@ -0,0 +1,91 @@
+"""In-process progress tracking for running imports, streamed to clients over SSE"""
+import asyncio
+import time
+from typing import Dict, Optional
+
+# Finished imports stay visible this long so a late listener still sees the final event
+FINISHED_RETENTION_SECONDS = 60
+
+
+class ImportProgress:
+    """Counters of one running import; listeners wait for the version to change"""
+
+    def __init__(self, import_id, total_rows):
+        self.import_id = import_id
+        self.total_rows = total_rows
+        self.rows_parsed = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.duplicates = 0
+        self.errors = 0
+        self.status = "running"
+        self.detail = None
+        self.started = time.monotonic()
+        self.version = 0
+        self.keys = [import_id]
+        self._changed = asyncio.Event()
+
+    def update(self, **counters):
+        for name, value in counters.items():
+            setattr(self, name, value)
+        self.version += 1
+        # Wake current listeners and give the next ones a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def finish(self, status, detail=None):
+        self.update(status=status, detail=detail)
+        loop = asyncio.get_running_loop()
+        for key in self.keys:
+            loop.call_later(FINISHED_RETENTION_SECONDS, _active_imports.pop, key, None)
+
+    async def wait_for_change(self, version, timeout):
+        """Return once the version differs from the given one, or raise TimeoutError"""
+        if self.version != version:
+            return
+        await asyncio.wait_for(self._changed.wait(), timeout)
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started
+        rows_per_second = self.rows_parsed / elapsed if elapsed > 0 else 0
+        remaining = max(self.total_rows - self.rows_parsed, 0)
+        return {
+            "import_id": self.import_id,
+            "status": self.status,
+            "total_rows": self.total_rows,
+            "rows_parsed": self.rows_parsed,
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed, 2),
+            "rows_per_second": round(rows_per_second, 1),
+            "eta_seconds": round(remaining / rows_per_second, 1) if rows_per_second else None,
+            "detail": self.detail,
+        }
+
+
+_active_imports: Dict[str, ImportProgress] = {}
+
+
+def start_progress(import_id, total_rows, aliases=()):
+    """Register a running import; aliases are extra ids listeners may have subscribed with"""
+    progress = ImportProgress(import_id, total_rows)
+    progress.keys = [import_id, *aliases]
+    for key in progress.keys:
+        _active_imports[key] = progress
+    return progress
+
+
+def get_progress(import_id) -> Optional[ImportProgress]:
+    return _active_imports.get(import_id)
+
+
+async def wait_for_progress(import_id, timeout, poll_interval=0.1):
+    """Wait for an import to start, so clients can subscribe before uploading"""
+    deadline = time.monotonic() + timeout
+    while True:
+        progress = _active_imports.get(import_id)
+        if progress is not None or time.monotonic() >= deadline:
+            return progress
+        await asyncio.sleep(poll_interval)
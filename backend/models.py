@@ -0,0 +1,49 @@
+"""Expense categories and the API models shared by the server and the CLI"""
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+import uuid
+from datetime import datetime
+
+# Expense Categories
+EXPENSE_CATEGORIES = [
+    {"id": "food", "name": "Yiyecek & İçecek", "color": "#FF6B6B", "icon": "🍽️"},
+    {"id": "transport", "name": "Ulaşım", "color": "#4ECDC4", "icon": "🚗"},
+    {"id": "entertainment", "name": "Eğlence", "color": "#45B7D1", "icon": "🎬"},
+    {"id": "shopping", "name": "Alışveriş", "color": "#96CEB4", "icon": "🛍️"},
+    {"id": "health", "name": "Sağlık", "color": "#FFEAA7", "icon": "🏥"},
+    {"id": "education", "name": "Eğitim", "color": "#DDA0DD", "icon": "📚"},
+    {"id": "bills", "name": "Faturalar", "color": "#FF7675", "icon": "💡"},
+    {"id": "other", "name": "Diğer", "color": "#A0A0A0", "icon": "📦"}
+]
+# Built once; category checks run on every write
+VALID_CATEGORY_IDS = frozenset(cat["id"] for cat in EXPENSE_CATEGORIES)
+
+# Define Models
+class ExpenseCreate(BaseModel):
+    title: str
+    amount: float
+    category: str
+    description: Optional[str] = None
+    date: Optional[str] = None  # Accept date as string from frontend
+
+class Expense(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    title: str
+    amount: float
+    category: str
+    description: Optional[str] = None
+    date: str  # Store as string in MongoDB
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ExpenseUpdate(BaseModel):
+    title: Optional[str] = None
+    amount: Optional[float] = None
+    category: Optional[str] = None
+    description: Optional[str] = None
+    date: Optional[str] = None
+
+class ExpenseBulkRequest(BaseModel):
+    ids: List[str]
+    operation: Literal["set_category", "set_fields", "delete"]
+    category: Optional[str] = None  # for set_category
+    fields: Optional[ExpenseUpdate] = None  # for set_fields
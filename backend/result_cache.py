@@ -0,0 +1,151 @@
+"""Bounded in-process cache for computed results, invalidated by TTL and data version"""
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """LRU cache of computed values with single-flight computation.
+
+    An entry is served while it is younger than ttl_seconds and was
+    computed at the data version the caller passes in, so any write makes
+    it stale. Concurrent callers asking for the same key and version share
+    one computation instead of each running it.
+    """
+
+    def __init__(self, max_entries=128, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+
+    async def get_or_compute(self, key, version, compute):
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry_version, expires_at, value = entry
+            if entry_version == version and expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        task = self._inflight.get((key, version))
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._compute(key, version, compute))
+            self._inflight[(key, version)] = task
+        else:
+            self.coalesced += 1
+        # A caller that goes away must not cancel the computation others wait for
+        return await asyncio.shield(task)
+
+    async def _compute(self, key, version, compute):
+        try:
+            value = await compute()
+        finally:
+            self._inflight.pop((key, version), None)
+        self._entries[key] = (version, time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def clear(self):
+        self._entries.clear()
+
+    def metrics(self):
+        requests = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.coalesced) / requests, 4) if requests else None
+        }
+
+
+class FilterCache:
+    """LRU cache of query results, each tagged with the date range and category it covers.
+
+    A write reports the (date, category) pairs it touched, and only entries
+    whose range and category could contain one of them are dropped. Results
+    whose query started before an invalidation are not stored, since they
+    may have missed that write.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, scope, value, generation):
+        """scope is (start_date, end_date, category); None parts match anything"""
+        if generation != self.generation:
+            return
+        self._entries[key] = (scope, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, changes):
+        """Drop entries that could contain any of the written (date, category) pairs"""
+        changes = set(changes)
+        if not changes:
+            return
+        self.generation += 1
+        stale = [
+            key for key, (scope, _) in self._entries.items()
+            if any(scope_covers(scope, expense_date, category) for expense_date, category in changes)
+        ]
+        for key in stale:
+            del self._entries[key]
+        self.invalidated += len(stale)
+
+    def clear(self):
+        self.generation += 1
+        self.invalidated += len(self._entries)
+        self._entries.clear()
+
+    def metrics(self):
+        requests = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidated": self.invalidated,
+            "hit_rate": round(self.hits / requests, 4) if requests else None
+        }
+
+
+def scope_covers(scope, expense_date, category):
+    start_date, end_date, scope_category = scope
+    if scope_category is not None and category != scope_category:
+        return False
+    # Dates that are not ISO strings cannot be compared, so they match every range
+    if not isinstance(expense_date, str):
+        return True
+    if start_date is not None and expense_date < start_date:
+        return False
+    if end_date is not None and expense_date > end_date:
+        return False
+    return True
@@ -1,20 +1,35 @@
-from fastapi import FastAPI, APIRouter, HTTPException, File, UploadFile
+from fastapi import FastAPI, APIRouter, HTTPException, File, UploadFile, Request, Header
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pydantic import TypeAdapter, ValidationError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, date, timedelta
 from decimal import Decimal
-import pandas as pd
 import io
-from PyPDF2 import PdfReader
+import zipfile
 import re
 import json
+import hashlib
+import asyncio
+from import_progress import start_progress, get_progress, wait_for_progress
+from group_commit import GroupCommitBuffer
+from data_version import data_version
+from result_cache import ResultCache, FilterCache
+from models import EXPENSE_CATEGORIES, VALID_CATEGORY_IDS, ExpenseCreate, Expense, ExpenseUpdate, ExpenseBulkRequest
+from categorization import expense_doc_from_row, statement_expense_doc
+from forecasting import build_month_matrix, forecast_matrix, month_range, shift_month
+from statement_parser import (
+    SUPPORTED_EXTENSIONS, read_statement, detect_statement_format, split_dedup_key
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -30,42 +45,6 @@ app = FastAPI()
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Expense Categories
-EXPENSE_CATEGORIES = [
-    {"id": "food", "name": "Yiyecek & İçecek", "color": "#FF6B6B", "icon": "🍽️"},
-    {"id": "transport", "name": "Ulaşım", "color": "#4ECDC4", "icon": "🚗"},
-    {"id": "entertainment", "name": "Eğlence", "color": "#45B7D1", "icon": "🎬"},
-    {"id": "shopping", "name": "Alışveriş", "color": "#96CEB4", "icon": "🛍️"},
-    {"id": "health", "name": "Sağlık", "color": "#FFEAA7", "icon": "🏥"},
-    {"id": "education", "name": "Eğitim", "color": "#DDA0DD", "icon": "📚"},
-    {"id": "bills", "name": "Faturalar", "color": "#FF7675", "icon": "💡"},
-    {"id": "other", "name": "Diğer", "color": "#A0A0A0", "icon": "📦"}
-]
-
-# Define Models
-class ExpenseCreate(BaseModel):
-    title: str
-    amount: float
-    category: str
-    description: Optional[str] = None
-    date: Optional[str] = None  # Accept date as string from frontend
-
-class Expense(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    title: str
-    amount: float
-    category: str
-    description: Optional[str] = None
-    date: str  # Store as string in MongoDB
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-
-class ExpenseUpdate(BaseModel):
-    title: Optional[str] = None
-    amount: Optional[float] = None
-    category: Optional[str] = None
-    description: Optional[str] = None
-    date: Optional[str] = None
-
 # Root endpoint
 @api_router.get("/")
 async def root():
@@ -76,28 +55,189 @@ async def root():
 async def get_categories():
     return EXPENSE_CATEGORIES
 
+# Filter results are cached per query and dropped when a write touches their date range and category
+filter_cache = FilterCache(max_entries=int(os.environ.get('FILTER_CACHE_MAX_ENTRIES', 256)))
+
+def record_write(changes=None):
+    """Call after every write: bumps the data version and invalidates cached filter results.
+
+    changes lists the (date, category) pairs of every expense written, with
+    old and new values for updates; None means the affected expenses are
+    unknown and every cached filter result is dropped.
+    """
+    data_version.bump()
+    if changes is None:
+        filter_cache.clear()
+    else:
+        filter_cache.invalidate(changes)
+
+def expense_scope(expense):
+    return (expense.get('date'), expense.get('category'))
+
+# Idempotency-Key support: the first response per key is stored and replayed to retries
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+# A request still marked pending after this long died mid-way and may be retried
+IDEMPOTENCY_PENDING_TIMEOUT = timedelta(minutes=10)
+
+def request_fingerprint(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+    return digest.hexdigest()
+
+async def claim_idempotency_key(key: str, endpoint: str, fingerprint: str):
+    """Reserve a key for this request, or return the response stored for it by an earlier one"""
+    now = datetime.utcnow()
+    try:
+        await db.idempotency_keys.insert_one({
+            "key": key,
+            "endpoint": endpoint,
+            "fingerprint": fingerprint,
+            "status": "pending",
+            "created_at": now
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+    
+    record = await db.idempotency_keys.find_one({"key": key, "endpoint": endpoint}, {"_id": 0})
+    if record is None:
+        raise HTTPException(status_code=409, detail="Idempotency-Key expired while in use, please retry")
+    if record['fingerprint'] != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if record['status'] == "done":
+        return record['response']
+    if now - record['created_at'] < IDEMPOTENCY_PENDING_TIMEOUT:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    
+    # The first attempt never finished; let this one take over
+    taken = await db.idempotency_keys.find_one_and_update(
+        {"key": key, "endpoint": endpoint, "status": "pending", "created_at": record['created_at']},
+        {"$set": {"created_at": now}}
+    )
+    if taken is None:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    return None
+
+async def run_idempotent(key: Optional[str], endpoint: str, fingerprint: str, handler):
+    """Run handler once per Idempotency-Key; without a key it simply runs"""
+    if not key:
+        return await handler()
+    
+    stored = await claim_idempotency_key(key, endpoint, fingerprint)
+    if stored is not None:
+        return stored
+    try:
+        response = await handler()
+    except BaseException:
+        # Failed requests are not cached, so the client can retry them
+        await db.idempotency_keys.delete_one({"key": key, "endpoint": endpoint})
+        raise
+    
+    await db.idempotency_keys.update_one(
+        {"key": key, "endpoint": endpoint},
+        {"$set": {"status": "done", "response": jsonable_encoder(response)}}
+    )
+    return response
+
+# Optional group commit for high-rate creates: each create still waits until its
+# document is written, but concurrent creates share one insert_many
+EXPENSE_GROUP_COMMIT = os.environ.get('EXPENSE_GROUP_COMMIT', '').lower() in ('1', 'true', 'yes')
+
+async def insert_expense_group(docs):
+    await db.expenses.insert_many(docs, ordered=False)
+
+expense_group_commit = GroupCommitBuffer(
+    insert_expense_group,
+    max_batch_size=int(os.environ.get('EXPENSE_GROUP_COMMIT_MAX_BATCH', 500)),
+    max_delay=float(os.environ.get('EXPENSE_GROUP_COMMIT_DELAY_MS', 5)) / 1000,
+    max_pending=int(os.environ.get('EXPENSE_GROUP_COMMIT_MAX_PENDING', 10000))
+)
+
 # Create a new expense
 @api_router.post("/expenses", response_model=Expense)
-async def create_expense(expense_data: ExpenseCreate):
+async def create_expense(expense_data: ExpenseCreate, idempotency_key: Optional[str] = Header(None)):
     # Validate category
-    valid_categories = [cat["id"] for cat in EXPENSE_CATEGORIES]
-    if expense_data.category not in valid_categories:
+    if expense_data.category not in VALID_CATEGORY_IDS:
         raise HTTPException(status_code=400, detail="Invalid category")
     
-    expense_dict = expense_data.dict()
-    
-    # Set default date if not provided
-    if not expense_dict.get('date'):
-        expense_dict['date'] = date.today().isoformat()
+    async def insert_expense():
+        expense_dict = expense_data.dict()
+        
+        # Set default date if not provided
+        if not expense_dict.get('date'):
+            expense_dict['date'] = date.today().isoformat()
+            
+        expense_obj = Expense(**expense_dict)
         
-    expense_obj = Expense(**expense_dict)
+        # Convert to dict for MongoDB
+        expense_doc = expense_obj.dict()
+        expense_doc['created_at'] = expense_obj.created_at.isoformat()
+        
+        if expense_group_commit.running:
+            await expense_group_commit.submit(expense_doc)
+        else:
+            await db.expenses.insert_one(expense_doc)
+        record_write([expense_scope(expense_doc)])
+        return expense_obj
     
-    # Convert to dict for MongoDB
-    expense_doc = expense_obj.dict()
-    expense_doc['created_at'] = expense_obj.created_at.isoformat()
+    fingerprint = request_fingerprint(json.dumps(expense_data.dict(), sort_keys=True))
+    return await run_idempotent(idempotency_key, "create_expense", fingerprint, insert_expense)
+
+MAX_BATCH_EXPENSES = 10000
+expense_batch_adapter = TypeAdapter(List[ExpenseCreate])
+
+# Create many expenses at once, for clients syncing from other tools
+@api_router.post("/expenses/batch")
+async def create_expenses_batch(request: Request, idempotency_key: Optional[str] = Header(None)):
+    """Validate a JSON array of expenses in one pass and store them with a single insert_many.
+
+    The batch is all or nothing: any invalid expense rejects the whole request.
+    """
+    # Validating the raw body skips building an intermediate list of dicts
+    body = await request.body()
+    try:
+        expenses = expense_batch_adapter.validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+    if not expenses:
+        raise HTTPException(status_code=400, detail="No expenses given")
+    if len(expenses) > MAX_BATCH_EXPENSES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_EXPENSES} expenses per request")
+    
+    invalid = [
+        {"index": index, "category": expense.category}
+        for index, expense in enumerate(expenses)
+        if expense.category not in VALID_CATEGORY_IDS
+    ]
+    if invalid:
+        raise HTTPException(status_code=400, detail={"message": "Invalid category", "expenses": invalid})
+    
+    async def insert_expenses():
+        today = date.today().isoformat()
+        created_at = datetime.utcnow().isoformat()
+        docs = [
+            {
+                "id": str(uuid.uuid4()),
+                "title": expense.title,
+                "amount": expense.amount,
+                "category": expense.category,
+                "description": expense.description,
+                "date": expense.date or today,
+                "created_at": created_at
+            }
+            for expense in expenses
+        ]
+        await db.expenses.insert_many(docs)
+        record_write([expense_scope(doc) for doc in docs])
+        
+        return {
+            "message": f"Created {len(docs)} expenses",
+            "created": len(docs),
+            "ids": [doc['id'] for doc in docs]
+        }
     
-    await db.expenses.insert_one(expense_doc)
-    return expense_obj
+    return await run_idempotent(idempotency_key, "create_expenses_batch", request_fingerprint(body), insert_expenses)
 
 # Get all expenses
 @api_router.get("/expenses", response_model=List[Expense])
@@ -111,89 +251,198 @@ async def get_expenses():
     
     return [Expense(**expense) for expense in expenses]
 
-# Expense predictions based on historical data
-@api_router.get("/expenses/predictions")
-async def get_expense_predictions():
-    """Predict next month expenses based on historical data"""
-    # Get last 3 months of data
-    now = datetime.utcnow()
-    three_months_ago = (now.replace(day=1) - timedelta(days=90)).date().isoformat()
+# Analytics: the stats endpoints and /dashboard read expenses through one $facet
+# pipeline, each endpoint running only the facets it needs
+VALID_MONTH_PATTERN = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+# Turkish month names
+TURKISH_MONTHS = {
+    1: "Ocak", 2: "Şubat", 3: "Mart", 4: "Nisan",
+    5: "Mayıs", 6: "Haziran", 7: "Temmuz", 8: "Ağustos",
+    9: "Eylül", 10: "Ekim", 11: "Kasım", 12: "Aralık"
+}
+
+# Complete months of history the predictions are fitted on
+FORECAST_HISTORY_MONTHS = int(os.environ.get('FORECAST_HISTORY_MONTHS', 24))
+FORECAST_INTERVAL_LEVEL = 80
+
+def analytics_date_bounds(now):
+    """ISO date bounds of the windows used by predictions, insights and limits"""
+    current_month_start = now.replace(day=1)
+    last_month_end = current_month_start - timedelta(days=1)
+    next_month_start = (current_month_start + timedelta(days=32)).replace(day=1)
+    return {
+        "forecast_history_start": shift_month(last_month_end.strftime("%Y-%m"), 1 - FORECAST_HISTORY_MONTHS) + "-01",
+        "last_month_start": last_month_end.replace(day=1).date().isoformat(),
+        "last_month_end": last_month_end.date().isoformat(),
+        "current_month_start": current_month_start.date().isoformat(),
+        "current_month_end": (next_month_start - timedelta(days=1)).date().isoformat(),
+        "today": now.date().isoformat()
+    }
+
+def analytics_facets(now):
+    bounds = analytics_date_bounds(now)
+    month_category = {"month": {"$substr": ["$date", 0, 7]}, "category": "$category"}
     
-    expenses = await db.expenses.find({
-        "date": {"$gte": three_months_ago}
-    }).to_list(1000)
+    def totals(group_id, date_range=None):
+        stages = [{"$match": {"date": date_range}}] if date_range else []
+        stages.append({"$group": {
+            "_id": group_id, "total": {"$sum": "$amount"}, "count": {"$sum": 1}, "largest": {"$max": "$amount"}
+        }})
+        return stages
     
-    # Group by month and category
-    monthly_data = {}
-    for expense in expenses:
-        try:
-            expense_date = datetime.fromisoformat(expense['date'])
-            month_key = expense_date.strftime("%Y-%m")
-            category = expense['category']
-            
-            if month_key not in monthly_data:
-                monthly_data[month_key] = {}
-            if category not in monthly_data[month_key]:
-                monthly_data[month_key][category] = 0
-            
-            monthly_data[month_key][category] += expense['amount']
-        except:
+    return {
+        "by_category": totals("$category"),
+        "by_month_category": totals(month_category),
+        "history_by_month_category": totals(
+            month_category, {"$gte": bounds["forecast_history_start"], "$lt": bounds["current_month_start"]}
+        ),
+        "insights_by_month_category": totals(
+            month_category, {"$gte": bounds["last_month_start"], "$lte": bounds["today"]}
+        ),
+        "whole_month_by_category": totals(
+            "$category", {"$gte": bounds["current_month_start"], "$lte": bounds["current_month_end"]}
+        )
+    }
+
+async def run_analytics_facets(names, now):
+    """Run the named facets in a single aggregation, i.e. one pass over the expenses"""
+    facets = analytics_facets(now)
+    pipeline = [{"$facet": {name: facets[name] for name in names}}]
+    result = await db.expenses.aggregate(pipeline).to_list(1)
+    return result[0] if result else {name: [] for name in names}
+
+# Analytics results are reused until the next write (or the TTL, as a safety net)
+analytics_cache = ResultCache(
+    max_entries=int(os.environ.get('ANALYTICS_CACHE_MAX_ENTRIES', 128)),
+    ttl_seconds=float(os.environ.get('ANALYTICS_CACHE_TTL_SECONDS', 300))
+)
+
+async def cached_analytics(name: str, compute, *params):
+    """Result of compute(now), shared by every request until the data version changes"""
+    now = datetime.utcnow()
+    # Several results depend on the current day and month, so the day is part of the key
+    key = (name, now.date().isoformat(), *params)
+    return await analytics_cache.get_or_compute(key, data_version.token(), lambda: compute(now))
+
+def valid_month(month_key):
+    return isinstance(month_key, str) and VALID_MONTH_PATTERN.match(month_key) is not None
+
+def build_expense_stats(category_rows):
+    category_stats = {}
+    for row in category_rows:
+        stats = {'total': row['total'], 'count': row['count']}
+        category_info = next((cat for cat in EXPENSE_CATEGORIES if cat['id'] == row['_id']), None)
+        if category_info:
+            stats['name'] = category_info['name']
+            stats['color'] = category_info['color']
+            stats['icon'] = category_info['icon']
+        category_stats[row['_id']] = stats
+    
+    return {
+        "total_amount": sum(row['total'] for row in category_rows),
+        "expense_count": sum(row['count'] for row in category_rows),
+        "category_stats": category_stats
+    }
+
+def build_monthly_stats(month_category_rows):
+    monthly_stats = {}
+    for row in month_category_rows:
+        month_key = row['_id']['month']
+        # Expenses without a parseable date are left out of the monthly view
+        if not valid_month(month_key):
             continue
+        stats = monthly_stats.setdefault(month_key, {
+            'month_key': month_key,
+            'month': f"{TURKISH_MONTHS[int(month_key[5:7])]} {month_key[:4]}",
+            'total': 0,
+            'count': 0,
+            'categories': {}
+        })
+        stats['total'] += row['total']
+        stats['count'] += row['count']
+        category = row['_id']['category']
+        stats['categories'][category] = stats['categories'].get(category, 0) + row['total']
+    
+    return sorted(monthly_stats.values(), key=lambda x: x['month_key'])
+
+def build_trend_stats(month_category_rows):
+    # Group by category and month
+    trends = {}
+    for row in month_category_rows:
+        month_key = row['_id']['month'] if valid_month(row['_id']['month']) else "Unknown"
+        monthly_data = trends.setdefault(row['_id']['category'], {})
+        monthly_data[month_key] = monthly_data.get(month_key, 0) + row['total']
+    
+    # Format for chart consumption
+    formatted_trends = []
+    for category_info in EXPENSE_CATEGORIES:
+        monthly_data = trends.get(category_info['id'])
+        if monthly_data:
+            formatted_trends.append({
+                'category': category_info['name'],
+                'category_id': category_info['id'],
+                'color': category_info['color'],
+                'data': [{'month': month, 'amount': amount} for month, amount in sorted(monthly_data.items())]
+            })
+    
+    return formatted_trends
+
+def build_predictions(history_rows, now):
+    """Next month's spending per category, forecast from the complete months before this one"""
+    last_month = (now.replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+    months = month_range(last_month, FORECAST_HISTORY_MONTHS)
+    category_ids = [cat['id'] for cat in EXPENSE_CATEGORIES]
+    matrix = build_month_matrix(history_rows, category_ids, months)
+    # The current month is still incomplete, so next month is two steps ahead
+    forecast = forecast_matrix(matrix, horizon=2, level=FORECAST_INTERVAL_LEVEL)
     
-    # Calculate averages for predictions
     predictions = {}
-    for category_id, category_info in [(cat['id'], cat) for cat in EXPENSE_CATEGORIES]:
-        category_totals = []
-        for month_data in monthly_data.values():
-            category_totals.append(month_data.get(category_id, 0))
-        
-        if category_totals:
-            avg_amount = sum(category_totals) / len(category_totals)
-            # Add 10% growth factor
-            predicted_amount = avg_amount * 1.1
-            
-            predictions[category_id] = {
-                "category_name": category_info['name'],
-                "icon": category_info['icon'],
-                "predicted_amount": round(predicted_amount, 2),
-                "historical_average": round(avg_amount, 2),
-                "confidence": min(len(category_totals) * 33.33, 100)  # Higher confidence with more data
-            }
+    for i, category_info in enumerate(EXPENSE_CATEGORIES):
+        if forecast.observed_months[i] == 0:
+            continue
+        point = float(forecast.point[i])
+        lower = float(forecast.lower[i])
+        upper = float(forecast.upper[i])
+        # Narrower intervals relative to the forecast mean higher confidence
+        confidence = 100 * (1 - (upper - lower) / (2 * point)) if point > 0 else 0
+        predictions[category_info['id']] = {
+            "category_name": category_info['name'],
+            "icon": category_info['icon'],
+            "predicted_amount": round(point, 2),
+            "lower": round(lower, 2),
+            "upper": round(upper, 2),
+            "interval_level": forecast.level,
+            "method": forecast.method[i],
+            "historical_average": round(float(forecast.history_mean[i]), 2),
+            "confidence": round(min(max(confidence, 0), 100), 1)
+        }
     
     return {
         "predictions": predictions,
         "prediction_month": (now.replace(day=1) + timedelta(days=32)).strftime("%B %Y"),
-        "based_on_months": len(monthly_data)
+        "based_on_months": int((matrix.sum(axis=0) > 0).sum())
     }
 
-# Smart insights and recommendations
-@api_router.get("/expenses/insights")
-async def get_smart_insights():
-    """Generate smart insights about spending patterns"""
-    # Get last month's data
-    now = datetime.utcnow()
+# A category is flagged when its projected spending grows by more than this share
+CATEGORY_INCREASE_THRESHOLD = 0.2
+# A transaction is unusual when it is this many times the category's other transactions on average
+UNUSUAL_TRANSACTION_FACTOR = 3
+UNUSUAL_TRANSACTION_MIN_COUNT = 3
+
+def build_insights(month_category_rows, now):
+    """Insights from per (month, category) totals of last month and this month so far"""
     last_month = (now.replace(day=1) - timedelta(days=1))
-    last_month_start = last_month.replace(day=1).date().isoformat()
-    last_month_end = last_month.date().isoformat()
-    
-    # Get current month's data
-    current_month_start = now.replace(day=1).date().isoformat()
-    current_month_end = now.date().isoformat()
-    
-    # Fetch data
-    last_month_expenses = await db.expenses.find({
-        "date": {"$gte": last_month_start, "$lte": last_month_end}
-    }).to_list(1000)
-    
-    current_month_expenses = await db.expenses.find({
-        "date": {"$gte": current_month_start, "$lte": current_month_end}
-    }).to_list(1000)
-    
+    last_month_key = last_month.strftime("%Y-%m")
+    current_month_key = now.strftime("%Y-%m")
     insights = []
     
+    last_month_rows = [row for row in month_category_rows if row['_id']['month'] == last_month_key]
+    current_month_rows = [row for row in month_category_rows if row['_id']['month'] == current_month_key]
+    
     # Calculate totals
-    last_month_total = sum(exp['amount'] for exp in last_month_expenses)
-    current_month_total = sum(exp['amount'] for exp in current_month_expenses)
+    last_month_total = sum(row['total'] for row in last_month_rows)
+    current_month_total = sum(row['total'] for row in current_month_rows)
     
     # Progress comparison
     days_in_current_month = now.day
@@ -220,10 +469,8 @@ async def get_smart_insights():
         })
     
     # Category analysis
-    current_categories = {}
-    for expense in current_month_expenses:
-        cat = expense['category']
-        current_categories[cat] = current_categories.get(cat, 0) + expense['amount']
+    last_categories = {row['_id']['category']: row['total'] for row in last_month_rows}
+    current_categories = {row['_id']['category']: row['total'] for row in current_month_rows}
     
     # Find highest spending categories
     if current_categories:
@@ -238,6 +485,53 @@ async def get_smart_insights():
                 "priority": "low"
             })
     
+    # Category whose projected spending grew the most since last month
+    month_scale = days_in_last_month / days_in_current_month if days_in_current_month > 0 else 0
+    increases = [
+        (current * month_scale - last_categories[category], category, current * month_scale)
+        for category, current in current_categories.items()
+        if last_categories.get(category, 0) > 0
+        and current * month_scale > last_categories[category] * (1 + CATEGORY_INCREASE_THRESHOLD)
+    ]
+    if increases:
+        increase, category, projected = max(increases, key=lambda x: x[0])
+        category_info = next((cat for cat in EXPENSE_CATEGORIES if cat['id'] == category), None)
+        if category_info:
+            insights.append({
+                "type": "warning",
+                "title": "En Büyük Artış",
+                "message": f"{category_info['name']} harcamanız geçen aya göre %{(projected / last_categories[category] - 1) * 100:.0f} artış eğiliminde (₺{last_categories[category]:.2f} → ₺{projected:.2f}).",
+                "icon": category_info['icon'],
+                "priority": "medium"
+            })
+    
+    # This month's largest transaction per category against the category's other transactions
+    window = {}
+    for row in month_category_rows:
+        stats = window.setdefault(row['_id']['category'], {'total': 0, 'count': 0})
+        stats['total'] += row['total']
+        stats['count'] += row['count']
+    unusual = []
+    for row in current_month_rows:
+        stats = window[row['_id']['category']]
+        largest = row.get('largest') or 0
+        if stats['count'] < UNUSUAL_TRANSACTION_MIN_COUNT or largest <= 0:
+            continue
+        others_average = (stats['total'] - largest) / (stats['count'] - 1)
+        if others_average > 0 and largest >= others_average * UNUSUAL_TRANSACTION_FACTOR:
+            unusual.append((largest / others_average, row['_id']['category'], largest, others_average))
+    if unusual:
+        _, category, largest, others_average = max(unusual, key=lambda x: x[0])
+        category_info = next((cat for cat in EXPENSE_CATEGORIES if cat['id'] == category), None)
+        if category_info:
+            insights.append({
+                "type": "warning",
+                "title": "Olağandışı Harcama",
+                "message": f"Bu ay {category_info['name']} kategorisinde ₺{largest:.2f} tutarında bir harcama var; bu kategorideki ortalama harcamanız ₺{others_average:.2f}.",
+                "icon": "🔍",
+                "priority": "medium"
+            })
+    
     return {
         "insights": insights,
         "summary": {
@@ -248,6 +542,68 @@ async def get_smart_insights():
         }
     }
 
+def build_limit_check(month_rows, latest_limits, now):
+    # Calculate current spending by category
+    current_spending = {row['_id']: row['total'] for row in month_rows}
+    
+    warnings = []
+    if latest_limits:
+        limits = latest_limits['limits']
+        for category, limit in limits.items():
+            current = current_spending.get(category, 0)
+            if current > limit:
+                category_info = next((cat for cat in EXPENSE_CATEGORIES if cat['id'] == category), None)
+                warnings.append({
+                    "category": category,
+                    "category_name": category_info['name'] if category_info else category,
+                    "icon": category_info['icon'] if category_info else '⚠️',
+                    "current": current,
+                    "limit": limit,
+                    "exceeded_by": current - limit,
+                    "percentage": (current / limit) * 100
+                })
+            elif current > limit * 0.8:  # 80% warning
+                category_info = next((cat for cat in EXPENSE_CATEGORIES if cat['id'] == category), None)
+                warnings.append({
+                    "category": category,
+                    "category_name": category_info['name'] if category_info else category,
+                    "icon": category_info['icon'] if category_info else '⚠️',
+                    "current": current,
+                    "limit": limit,
+                    "warning_type": "approaching_limit",
+                    "percentage": (current / limit) * 100
+                })
+    
+    return {
+        "current_spending": current_spending,
+        "warnings": warnings,
+        "month": f"{now.strftime('%B %Y')}",
+        "total_spent": sum(current_spending.values())
+    }
+
+async def find_latest_limits():
+    return await db.expense_limits.find_one({}, {"_id": 0}, sort=[("created_at", -1)])
+
+# Expense predictions based on historical data
+@api_router.get("/expenses/predictions")
+async def get_expense_predictions():
+    """Predict next month expenses based on historical data"""
+    # Monthly totals per category over the forecast history, fitted in one matrix
+    async def compute(now):
+        facets = await run_analytics_facets(["history_by_month_category"], now)
+        return build_predictions(facets["history_by_month_category"], now)
+    return await cached_analytics("predictions", compute)
+
+# Smart insights and recommendations
+@api_router.get("/expenses/insights")
+async def get_smart_insights():
+    """Generate smart insights about spending patterns"""
+    # Last month's and this month's spending per category
+    async def compute(now):
+        facets = await run_analytics_facets(["insights_by_month_category"], now)
+        return build_insights(facets["insights_by_month_category"], now)
+    return await cached_analytics("insights", compute)
+
 def formatCurrency(amount):
     return f"₺{amount:,.2f}"
 
@@ -295,6 +651,13 @@ async def filter_expenses(
             date_filter["$lte"] = end_date
         query["date"] = date_filter
     
+    # The same quick filters come in again and again; CLI writes change data_version.external
+    cache_key = (json.dumps(query, sort_keys=True), limit, data_version.external)
+    cached = filter_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    generation = filter_cache.generation
+    
     # Execute query and convert to list
     expenses_cursor = db.expenses.find(query, {"_id": 0}).sort("created_at", -1).limit(limit)
     expenses = await expenses_cursor.to_list(limit)
@@ -310,6 +673,8 @@ async def filter_expenses(
             # Skip invalid records
             continue
     
+    scope = (start_date or None, end_date or None, query.get("category"))
+    filter_cache.put(cache_key, scope, result_expenses, generation)
     return result_expenses
 
 # Get expense by ID
@@ -327,17 +692,27 @@ async def get_expense(expense_id: str):
 # Update expense
 @api_router.put("/expenses/{expense_id}", response_model=Expense)
 async def update_expense(expense_id: str, expense_data: ExpenseUpdate):
-    expense = await db.expenses.find_one({"id": expense_id})
-    if not expense:
-        raise HTTPException(status_code=404, detail="Expense not found")
-    
-    # Update fields
     update_data = expense_data.dict(exclude_unset=True)
+    if 'category' in update_data:
+        update_data['category_source'] = "user"
+    
+    # One round trip; the old document tells which cached filters the change affects,
+    # and applying the $set to it gives the updated one
     if update_data:
-        await db.expenses.update_one({"id": expense_id}, {"$set": update_data})
+        previous = await db.expenses.find_one_and_update(
+            {"id": expense_id},
+            {"$set": update_data},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+        updated_expense = {**previous, **update_data} if previous else None
+        if previous:
+            record_write([expense_scope(previous), expense_scope(updated_expense)])
+    else:
+        updated_expense = await db.expenses.find_one({"id": expense_id}, {"_id": 0})
+    if not updated_expense:
+        raise HTTPException(status_code=404, detail="Expense not found")
     
-    # Get updated expense
-    updated_expense = await db.expenses.find_one({"id": expense_id})
     if isinstance(updated_expense.get('created_at'), str):
         updated_expense['created_at'] = datetime.fromisoformat(updated_expense['created_at'])
     
@@ -346,459 +721,727 @@ async def update_expense(expense_id: str, expense_data: ExpenseUpdate):
 # Delete expense
 @api_router.delete("/expenses/{expense_id}")
 async def delete_expense(expense_id: str):
-    result = await db.expenses.delete_one({"id": expense_id})
-    if result.deleted_count == 0:
+    deleted = await db.expenses.find_one_and_delete({"id": expense_id}, projection={"_id": 0, "date": 1, "category": 1})
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Expense not found")
+    record_write([expense_scope(deleted)])
     return {"message": "Expense deleted successfully"}
 
-# Get expense statistics
-@api_router.get("/expenses/stats/summary")
-async def get_expense_stats():
-    expenses = await db.expenses.find().to_list(1000)
-    
-    total_amount = sum(expense['amount'] for expense in expenses)
-    expense_count = len(expenses)
-    
-    # Category breakdown
-    category_stats = {}
-    for expense in expenses:
-        category = expense['category']
-        if category not in category_stats:
-            category_stats[category] = {'total': 0, 'count': 0}
-        category_stats[category]['total'] += expense['amount']
-        category_stats[category]['count'] += 1
-    
-    # Find category info
-    for cat_id, stats in category_stats.items():
-        category_info = next((cat for cat in EXPENSE_CATEGORIES if cat['id'] == cat_id), None)
-        if category_info:
-            stats['name'] = category_info['name']
-            stats['color'] = category_info['color']
-            stats['icon'] = category_info['icon']
+MAX_BULK_IDS = 1000
+
+# Apply one operation to many expenses, e.g. from a multi-select in the UI
+@api_router.post("/expenses/bulk")
+async def bulk_update_expenses(request: ExpenseBulkRequest):
+    """Set the category, set fields or delete a list of expenses in one write"""
+    ids = list(dict.fromkeys(request.ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="No expense ids given")
+    if len(ids) > MAX_BULK_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_IDS} expenses per request")
+    
+    if request.operation == "set_category":
+        if request.category not in VALID_CATEGORY_IDS:
+            raise HTTPException(status_code=400, detail="Invalid category")
+        update_data = {"category": request.category, "category_source": "user"}
+    elif request.operation == "set_fields":
+        update_data = request.fields.dict(exclude_unset=True) if request.fields else {}
+        if not update_data:
+            raise HTTPException(status_code=400, detail="No fields to update")
+        if 'category' in update_data and update_data['category'] not in VALID_CATEGORY_IDS:
+            raise HTTPException(status_code=400, detail="Invalid category")
+        if 'category' in update_data:
+            update_data['category_source'] = "user"
+    
+    # update_many/delete_many only report counts, so look up which ids exist first
+    found = set()
+    changes = []
+    async for doc in db.expenses.find({"id": {"$in": ids}}, {"_id": 0, "id": 1, "date": 1, "category": 1}):
+        found.add(doc['id'])
+        changes.append(expense_scope(doc))
+        if request.operation != "delete":
+            changes.append(expense_scope({**doc, **update_data}))
+    
+    if request.operation == "delete":
+        result = await db.expenses.delete_many({"id": {"$in": list(found)}})
+        done_status = "deleted"
+        counts = {"deleted": result.deleted_count}
+    else:
+        result = await db.expenses.update_many({"id": {"$in": list(found)}}, {"$set": update_data})
+        done_status = "updated"
+        counts = {"matched": result.matched_count, "modified": result.modified_count}
+    record_write(changes)
     
     return {
-        "total_amount": total_amount,
-        "expense_count": expense_count,
-        "category_stats": category_stats
+        "operation": request.operation,
+        "requested": len(ids),
+        **counts,
+        "not_found": len(ids) - len(found),
+        "results": [
+            {"id": expense_id, "status": done_status if expense_id in found else "not_found"}
+            for expense_id in ids
+        ]
     }
 
+# Get expense statistics
+@api_router.get("/expenses/stats/summary")
+async def get_expense_stats():
+    async def compute(now):
+        facets = await run_analytics_facets(["by_category"], now)
+        return build_expense_stats(facets["by_category"])
+    return await cached_analytics("summary", compute)
+
 # Get monthly expense statistics
 @api_router.get("/expenses/stats/monthly")
 async def get_monthly_stats():
-    expenses = await db.expenses.find().to_list(1000)
-    
-    # Turkish month names
-    turkish_months = {
-        1: "Ocak", 2: "Şubat", 3: "Mart", 4: "Nisan",
-        5: "Mayıs", 6: "Haziran", 7: "Temmuz", 8: "Ağustos",
-        9: "Eylül", 10: "Ekim", 11: "Kasım", 12: "Aralık"
-    }
-    
-    monthly_stats = {}
-    for expense in expenses:
-        # Parse date string to extract year-month
-        expense_date = expense['date']
-        if isinstance(expense_date, str):
-            try:
-                parsed_date = datetime.fromisoformat(expense_date)
-                month_key = parsed_date.strftime("%Y-%m")
-                month_name = f"{turkish_months[parsed_date.month]} {parsed_date.year}"
-            except:
-                month_key = "Unknown"
-                month_name = "Bilinmeyen"
-        else:
-            month_key = "Unknown"
-            month_name = "Bilinmeyen"
-        
-        if month_key not in monthly_stats:
-            monthly_stats[month_key] = {
-                'month': month_name,
-                'total': 0,
-                'count': 0,
-                'categories': {}
-            }
-        
-        monthly_stats[month_key]['total'] += expense['amount']
-        monthly_stats[month_key]['count'] += 1
-        
-        # Category breakdown for each month
-        category = expense['category']
-        if category not in monthly_stats[month_key]['categories']:
-            monthly_stats[month_key]['categories'][category] = 0
-        monthly_stats[month_key]['categories'][category] += expense['amount']
-    
-    # Convert to list and sort by month
-    monthly_list = []
-    for month_key, stats in monthly_stats.items():
-        if month_key != "Unknown":
-            monthly_list.append({
-                'month_key': month_key,
-                'month': stats['month'],
-                'total': stats['total'],
-                'count': stats['count'],
-                'categories': stats['categories']
-            })
-    
-    # Sort by month_key
-    monthly_list.sort(key=lambda x: x['month_key'])
-    
-    return monthly_list
+    async def compute(now):
+        facets = await run_analytics_facets(["by_month_category"], now)
+        return build_monthly_stats(facets["by_month_category"])
+    return await cached_analytics("monthly", compute)
 
 # Get category trend data
 @api_router.get("/expenses/stats/trends")
 async def get_trend_stats():
-    expenses = await db.expenses.find().to_list(1000)
+    async def compute(now):
+        facets = await run_analytics_facets(["by_month_category"], now)
+        return build_trend_stats(facets["by_month_category"])
+    return await cached_analytics("trends", compute)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+PREVIEW_CHUNK_SIZE = 64 * 1024
+MAX_PREVIEW_ROWS = 1000
+# Titles, errors and duplicates echoed per upload; the rest is paged via /imports/{id}/rows
+SUMMARY_SAMPLE_SIZE = 10
+MAX_IMPORT_ROWS_PAGE = 500
+IMPORT_ROW_KINDS = ("imported", "duplicate", "error")
+PROGRESS_SUBSCRIBE_TIMEOUT = 30
+PROGRESS_KEEPALIVE_SECONDS = 15
+# A running import that has not checkpointed for this long is treated as interrupted
+IMPORT_STALE_SECONDS = 120
+# Batch uploads: statements imported at once, and limits on what a ZIP may expand to
+BATCH_IMPORT_WORKERS = 4
+MAX_BATCH_FILES = 100
+MAX_BATCH_UNCOMPRESSED_BYTES = 200 * 1024 * 1024
+
+async def read_upload(file: UploadFile):
+    """Read an uploaded file in chunks, hashing it with SHA-256 on the way in"""
+    digest = hashlib.sha256()
+    chunks = []
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+async def read_upload_head(file: UploadFile, max_lines: int):
+    """Read just enough of an upload to contain its header and max_lines rows.
+
+    Returns the bytes read and whether they are the whole file.
+    """
+    chunks = []
+    newlines = 0
+    complete = False
+    while newlines <= max_lines:
+        chunk = await file.read(PREVIEW_CHUNK_SIZE)
+        if not chunk:
+            complete = True
+            break
+        newlines += chunk.count(b"\n")
+        chunks.append(chunk)
+    return b"".join(chunks), complete
+
+async def find_interrupted_import(content_hash: str):
+    """Import of the same file that never completed, e.g. because the server restarted"""
+    return await db.imports.find_one(
+        {"content_hash": content_hash, "status": {"$in": ["running", "failed"]}},
+        {"_id": 0},
+        sort=[("created_at", -1)]
+    )
+
+async def find_previous_import(content_hash: str):
+    """Latest completed import of a file with the same content, if any"""
+    return await db.imports.find_one(
+        {"content_hash": content_hash, "status": "completed"},
+        {"_id": 0},
+        sort=[("created_at", -1)]
+    )
+
+IMPORT_BATCH_SIZE = 500
+
+async def insert_new_expenses(batch):
+    """Insert a batch of (row_number, doc) pairs, skipping docs whose dedup_key is already stored.
+
+    Returns the inserted and the skipped pairs.
+    """
+    if not batch:
+        return [], []
     
-    # Group by category and month
-    trends = {}
-    for expense in expenses:
-        category = expense['category']
-        expense_date = expense['date']
-        
-        if isinstance(expense_date, str):
-            try:
-                parsed_date = datetime.fromisoformat(expense_date)
-                month_key = parsed_date.strftime("%Y-%m")
-            except:
-                month_key = "Unknown"
+    keys = [doc['dedup_key'] for _, doc in batch]
+    existing = set()
+    async for doc in db.expenses.find({"dedup_key": {"$in": keys}}, {"_id": 0, "dedup_key": 1}):
+        existing.add(doc['dedup_key'])
+    
+    new_rows = [(row, doc) for row, doc in batch if doc['dedup_key'] not in existing]
+    skipped = [(row, doc) for row, doc in batch if doc['dedup_key'] in existing]
+    if not new_rows:
+        return [], skipped
+    
+    try:
+        await db.expenses.insert_many([doc for _, doc in new_rows], ordered=False)
+    except BulkWriteError as e:
+        # A concurrent import stored some of the same transactions in the meantime
+        write_errors = e.details.get('writeErrors', [])
+        if any(err.get('code') != 11000 for err in write_errors):
+            raise
+        failed = {err['index'] for err in write_errors}
+        skipped += [pair for i, pair in enumerate(new_rows) if i in failed]
+        new_rows = [pair for i, pair in enumerate(new_rows) if i not in failed]
+    
+    for _, doc in new_rows:
+        doc.pop('_id', None)
+    return new_rows, skipped
+
+async def preview_csv(file: UploadFile, preview_rows: int):
+    """Parse, clean and categorize the first rows of a CSV without writing anything"""
+    preview_rows = max(1, min(preview_rows, MAX_PREVIEW_ROWS))
+    contents, complete = await read_upload_head(file, preview_rows)
+    df = read_statement(contents, file.filename, nrows=preview_rows, partial=not complete)
+    
+    try:
+        parser = detect_statement_format(df)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    expenses = []
+    errors = []
+    categories_assigned = {}
+    for index, values in parser.iter_rows(df):
+        try:
+            parsed = parser.parse_row(values)
+            if parsed is None:
+                continue
+            expense_doc = expense_doc_from_row(parsed, VALID_CATEGORY_IDS)
+            track_category(categories_assigned, expense_doc['category'], expense_doc['title'])
+            expenses.append({"row": index + 1, **expense_doc})
+        except Exception as e:
+            errors.append(f"Row {index + 1}: {str(e)}")
+    
+    return {
+        "message": f"Preview of {len(expenses)} expenses, nothing was imported",
+        "dry_run": True,
+        "rows_read": len(df),
+        "expenses": expenses,
+        "errors": errors,
+        "auto_categorization": categories_assigned,
+        "detected_columns": parser.column_mapping,
+        "detected_format": parser.profile.name
+    }
+
+def track_category(summary: dict, category: str, title: str, count: int = 1):
+    """Count an expense under its category, keeping a few sample titles"""
+    entry = summary.setdefault(category, {"count": 0, "sample": []})
+    entry["count"] += count
+    if title and len(entry["sample"]) < SUMMARY_SAMPLE_SIZE:
+        entry["sample"].append(title)
+
+async def import_statement_rows(df, parser, import_id: str, progress=None, start_row: int = 0, counters=None, occurrences=None, sink=None):
+    """Parse, categorize and insert every row of a statement in batches.
+
+    After each batch the row offset is checkpointed on the import record, so
+    an interrupted import can continue from start_row with the counters and
+    dedup occurrences it had reached. Every error and skipped duplicate is
+    stored in import_issues; the returned summary only carries counts and
+    samples. progress, when given, is updated after each batch. Batches go
+    through sink.write when a shared ExpenseWriteSink is given.
+    """
+    counters = counters or {}
+    expenses_added = counters.get('imported', 0)
+    duplicate_count = counters.get('duplicates_skipped', 0)
+    filtered = counters.get('filtered', 0)
+    error_count = counters.get('errors', 0)
+    categories_assigned = {}
+    for category, count in counters.get('categories', {}).items():
+        track_category(categories_assigned, category, None, count)
+    rows_parsed = start_row
+    error_sample = []
+    duplicate_sample = []
+    issues = []
+    occurrences = occurrences if occurrences is not None else {}
+    batch = []
+    
+    def record_error(row_number, message):
+        nonlocal error_count
+        error_count += 1
+        message = f"Row {row_number}: {message}"
+        if len(error_sample) < SUMMARY_SAMPLE_SIZE:
+            error_sample.append(message)
+        issues.append({"import_id": import_id, "kind": "error", "row": row_number, "message": message})
+    
+    async def flush_batch():
+        nonlocal expenses_added, duplicate_count
+        if sink is not None:
+            inserted, skipped = await sink.write(batch)
         else:
-            month_key = "Unknown"
-        
-        if category not in trends:
-            trends[category] = {}
+            inserted, skipped = await insert_new_expenses(batch)
+        for row_number, doc in inserted:
+            expenses_added += 1
+            # Track categorization
+            track_category(categories_assigned, doc['category'], doc['title'])
+        for row_number, doc in skipped:
+            duplicate_count += 1
+            duplicate = {
+                "row": row_number,
+                "title": doc['title'],
+                "amount": doc['amount'],
+                "date": doc['date']
+            }
+            if len(duplicate_sample) < SUMMARY_SAMPLE_SIZE:
+                duplicate_sample.append(duplicate)
+            issues.append({"import_id": import_id, "kind": "duplicate", **duplicate})
+        batch.clear()
+        if issues:
+            await db.import_issues.insert_many(issues)
+            issues.clear()
         
-        if month_key not in trends[category]:
-            trends[category][month_key] = 0
+        await db.imports.update_one(
+            {"id": import_id},
+            {"$set": {
+                "checkpoint_row": rows_parsed,
+                "counters": {
+                    "imported": expenses_added,
+                    "duplicates_skipped": duplicate_count,
+                    "filtered": filtered,
+                    "errors": error_count,
+                    "categories": {cat: entry["count"] for cat, entry in categories_assigned.items()}
+                },
+                "heartbeat_at": datetime.utcnow().isoformat()
+            }}
+        )
+        record_write([expense_scope(doc) for _, doc in inserted])
+        if progress is not None:
+            progress.update(
+                rows_parsed=rows_parsed,
+                inserted=expenses_added,
+                skipped=filtered + duplicate_count,
+                duplicates=duplicate_count,
+                errors=error_count
+            )
+            # Parsing is CPU-bound, so let SSE listeners run between batches
+            await asyncio.sleep(0)
+    
+    for index, values in parser.iter_rows(df):
+        rows_parsed = start_row + index + 1
+        try:
+            parsed = parser.parse_row(values)
+            if parsed is None:
+                filtered += 1
+                continue
+            expense_doc = statement_expense_doc(parsed, VALID_CATEGORY_IDS, import_id, rows_parsed, occurrences)
+            batch.append((rows_parsed, expense_doc))
+            
+        except Exception as e:
+            record_error(rows_parsed, str(e))
         
-        trends[category][month_key] += expense['amount']
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush_batch()
     
-    # Format for chart consumption
-    formatted_trends = []
-    for cat_id, monthly_data in trends.items():
-        category_info = next((cat for cat in EXPENSE_CATEGORIES if cat['id'] == cat_id), None)
-        if category_info:
-            formatted_trends.append({
-                'category': category_info['name'],
-                'category_id': cat_id,
-                'color': category_info['color'],
-                'data': [{'month': month, 'amount': amount} for month, amount in sorted(monthly_data.items())]
-            })
+    # The final flush also reports progress for files smaller than one batch
+    await flush_batch()
     
-    return formatted_trends
+    return {
+        "message": f"Successfully imported {expenses_added} expenses",
+        "total_rows": start_row + len(df),
+        "imported": expenses_added,
+        "resumed_from_row": start_row,
+        "duplicates_skipped": duplicate_count,
+        "duplicates": duplicate_sample,
+        "error_count": error_count,
+        "errors": error_sample,
+        "auto_categorization": categories_assigned,
+        "detected_columns": parser.column_mapping,
+        "detected_format": parser.profile.name,
+        "details_url": f"/api/imports/{import_id}/rows"
+    }
 
-# Smart categorization system
-SMART_CATEGORIES = {
-    "food": [
-        "migros", "bim", "a101", "şok", "carrefour", "metro", "real", "kipa", "lidl",
-        "market", "bakkal", "manav", "kasap", "fırın", "pastane", "cafe", "restaurant",
-        "restoran", "lokanta", "pizzeria", "döner", "kebap", "burger", "mcdonald",
-        "burger king", "kfc", "dominos", "pizza hut", "starbucks", "kahve dünyası",
-        "yemek", "food", "gıda", "et", "tavuk", "balık", "sebze", "meyve"
-    ],
-    "transport": [
-        "benzin", "petrol", "shell", "bp", "total", "opet", "petlas", "oto",
-        "taksi", "uber", "bitaksi", "otobüs", "metro", "dolmuş", "minibüs",
-        "uçak", "pegasus", "turkish airlines", "onur air", "tren", "tcdd",
-        "yakıt", "akaryakıt", "garaj", "otopark", "köprü", "geçiş", "hgs", "ogs"
-    ],
-    "shopping": [
-        "zara", "h&m", "mango", "koton", "lc waikiki", "defacto", "colin's",
-        "mavi", "beymen", "vakko", "boyner", "teknosa", "vatan", "media markt",
-        "btech", "apple store", "samsung", "amazon", "trendyol", "hepsiburada",
-        "gittigidiyor", "n11", "sahibinden", "dolap", "modanisa", "ayakkabı",
-        "giyim", "kıyafet", "elektronik", "telefon", "bilgisayar", "laptop"
-    ],
-    "entertainment": [
-        "sinema", "cinema", "cinemax", "cinemaximum", "akmerkez", "forum",
-        "netflix", "spotify", "apple music", "youtube", "gaming", "playstation",
-        "xbox", "steam", "google play", "app store", "tiyatro", "konser",
-        "müze", "aquarium", "lunapark", "bowling", "bilardo", "karaoke",
-        "eğlence", "oyun", "film", "müzik", "kitap", "dergi"
-    ],
-    "health": [
-        "hastane", "hospital", "doktor", "doctor", "eczane", "pharmacy", "sağlık",
-        "tıp", "medical", "diş", "dental", "göz", "eye", "kulak", "ear",
-        "jinekolog", "üroloji", "kardiyoloji", "nöroloji", "psikiyatri",
-        "fizik tedavi", "laboratuvar", "röntgen", "mri", "ameliyat", "ilaç",
-        "vitamin", "medikal", "klinik", "sağlık ocağı"
-    ],
-    "education": [
-        "okul", "school", "üniversite", "university", "kurs", "course", "eğitim",
-        "education", "kitap", "book", "kırtasiye", "kalem", "defter", "çanta",
-        "udemy", "coursera", "khan academy", "özel ders", "dershane", "etüt",
-        "sınav", "test", "ödev", "proje", "akademi", "enstitü", "kolej"
-    ],
-    "bills": [
-        "elektrik", "electric", "tedaş", "ayedaş", "bedaş", "su", "water", "aski",
-        "doğalgaz", "gas", "igdaş", "internet", "ttnet", "turkcell", "vodafone",
-        "türk telekom", "telefon", "phone", "fatura", "bill", "abonelik",
-        "netflix", "spotify", "apple", "google", "microsoft", "amazon prime",
-        "aidat", "apartman", "site", "yönetim", "kira", "rent"
-    ]
-}
+def import_is_stale(import_record):
+    """Whether a running import has stopped checkpointing, i.e. its worker died"""
+    if import_record['status'] != "running":
+        return True
+    heartbeat = datetime.fromisoformat(import_record.get('heartbeat_at') or import_record['created_at'])
+    return datetime.utcnow() - heartbeat > timedelta(seconds=IMPORT_STALE_SECONDS)
+
+async def prepare_resume(import_id: str, start_row: int):
+    """Drop rows written after the last checkpoint and rebuild dedup occurrence counts"""
+    await db.expenses.delete_many({"import_id": import_id, "import_row": {"$gt": start_row}})
+    await db.import_issues.delete_many({"import_id": import_id, "row": {"$gt": start_row}})
+    record_write()
+    occurrences = {}
+    async for doc in db.expenses.find({"import_id": import_id}, {"_id": 0, "dedup_key": 1}):
+        transaction, occurrence = split_dedup_key(doc['dedup_key'])
+        occurrences[transaction] = max(occurrences.get(transaction, 0), occurrence)
+    return occurrences
+
+class ExpenseWriteSink:
+    """Coalesces insert batches from concurrent imports into shared insert_many calls.
 
-def smart_categorize(title, description=""):
-    """Automatically categorize expense based on title and description"""
-    text = f"{title} {description}".lower()
-    
-    # Score each category
-    category_scores = {}
-    for category, keywords in SMART_CATEGORIES.items():
-        score = 0
-        for keyword in keywords:
-            if keyword in text:
-                # Give higher score for exact matches
-                if keyword == text.strip():
-                    score += 10
-                # Give medium score for word matches
-                elif f" {keyword} " in f" {text} ":
-                    score += 5
-                # Give lower score for partial matches
-                elif keyword in text:
-                    score += 1
-        category_scores[category] = score
-    
-    # Return category with highest score, or 'other' if no match
-    if max(category_scores.values()) > 0:
-        return max(category_scores, key=category_scores.get)
-    return "other"
+    Batches that arrive while a write is in flight are merged and written
+    together by whichever caller gets the lock next.
+    """
+    
+    def __init__(self):
+        self._pending = []
+        self._lock = asyncio.Lock()
+    
+    async def write(self, batch):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((list(batch), future))
+        async with self._lock:
+            if not future.done():
+                pending, self._pending = self._pending, []
+                await self._write_pending(pending)
+        return await future
+    
+    async def _write_pending(self, pending):
+        owner = {}
+        combined = []
+        for index, (batch, _) in enumerate(pending):
+            for pair in batch:
+                owner[id(pair[1])] = index
+                combined.append(pair)
+        try:
+            inserted, skipped = await insert_new_expenses(combined)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        results = [([], []) for _ in pending]
+        for pair in inserted:
+            results[owner[id(pair[1])]][0].append(pair)
+        for pair in skipped:
+            results[owner[id(pair[1])]][1].append(pair)
+        for (_, future), result in zip(pending, results):
+            future.set_result(result)
+
+async def run_import(contents: bytes, content_hash: str, filename: str, force: bool = False, requested_id: Optional[str] = None, sink=None):
+    """Import one statement file: idempotency check, resume, detection and batched inserts"""
+    # Identical files are only parsed and written once unless forced
+    if not force:
+        previous = await find_previous_import(content_hash)
+        if previous:
+            return {
+                **previous['result'],
+                "message": f"File was already imported on {previous['created_at']}, nothing was added",
+                "already_imported": True,
+                "import_id": previous['id']
+            }
+    
+    # Client-chosen ids let listeners subscribe to progress before uploading
+    if requested_id and (get_progress(requested_id) or await db.imports.find_one({"id": requested_id}, {"_id": 1})):
+        raise HTTPException(status_code=409, detail="Import id already used")
+    
+    # The same file left half-imported (e.g. by a restart) continues from its checkpoint
+    start_row = 0
+    counters = None
+    interrupted = await find_interrupted_import(content_hash)
+    if interrupted:
+        active = get_progress(interrupted['id'])
+        if (active and active.status == "running") or not import_is_stale(interrupted):
+            raise HTTPException(status_code=409, detail="This file is already being imported")
+        start_row = interrupted.get('checkpoint_row', 0)
+        counters = interrupted.get('counters')
+    
+    # pandas parsing runs in a worker thread so other imports keep going meanwhile
+    df = await asyncio.to_thread(read_statement, contents, filename, None, start_row)
+    
+    # Detection is cached by header fingerprint, so repeat layouts skip it
+    try:
+        parser = detect_statement_format(df)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if interrupted:
+        import_id = interrupted['id']
+        occurrences = await prepare_resume(import_id, start_row)
+        await db.imports.update_one(
+            {"id": import_id},
+            {"$set": {"status": "running", "heartbeat_at": datetime.utcnow().isoformat()}}
+        )
+    else:
+        import_id = requested_id or str(uuid.uuid4())
+        occurrences = None
+        await db.imports.insert_one({
+            "id": import_id,
+            "filename": filename,
+            "content_hash": content_hash,
+            "size": len(contents),
+            "status": "running",
+            "checkpoint_row": 0,
+            "created_at": datetime.utcnow().isoformat(),
+            "heartbeat_at": datetime.utcnow().isoformat()
+        })
+    
+    aliases = [requested_id] if requested_id and requested_id != import_id else []
+    progress = start_progress(import_id, start_row + len(df), aliases=aliases)
+    try:
+        result = await import_statement_rows(
+            df, parser, import_id, progress,
+            start_row=start_row, counters=counters, occurrences=occurrences, sink=sink
+        )
+    except Exception as e:
+        progress.finish("failed", str(e))
+        # Keep the checkpoint so uploading the same file again resumes from it
+        await db.imports.update_one(
+            {"id": import_id},
+            {"$set": {"status": "failed", "error": str(e)}}
+        )
+        raise
+    
+    await db.imports.update_one(
+        {"id": import_id},
+        {"$set": {
+            "status": "completed",
+            "result": result,
+            "completed_at": datetime.utcnow().isoformat()
+        }}
+    )
+    progress.finish("completed", result["message"])
+    
+    return {**result, "already_imported": False, "import_id": import_id}
 
 # Enhanced file upload endpoint for CSV - FIXED VERSION
 @api_router.post("/upload/csv")
-async def upload_csv(file: UploadFile = File(...)):
+async def upload_csv(
+    file: UploadFile = File(...),
+    force: bool = False,
+    dry_run: bool = False,
+    preview_rows: int = 50,
+    import_id: Optional[str] = None,
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Import a CSV statement.
+
+    Clients that want live progress pick the import_id themselves and
+    subscribe to /imports/{import_id}/progress before uploading.
+    """
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
     
     try:
-        contents = await file.read()
-        # Try different encodings
-        try:
-            df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-        except UnicodeDecodeError:
-            try:
-                df = pd.read_csv(io.StringIO(contents.decode('iso-8859-9')))  # Turkish encoding
-            except UnicodeDecodeError:
-                df = pd.read_csv(io.StringIO(contents.decode('windows-1254')))  # Windows Turkish
+        # A dry run only reads the head of the file and never touches MongoDB
+        if dry_run:
+            return await preview_csv(file, preview_rows)
         
-        # Check if it's a bank statement format
-        # Common CSV formats: date, description, amount OR transaction_date, merchant, amount
-        possible_columns = {
-            'title': ['description', 'merchant', 'title', 'açıklama', 'işlem açıklaması', 'merchant_name'],
-            'amount': ['amount', 'tutar', 'miktar', 'toplam', 'total', 'transaction_amount'],
-            'date': ['date', 'tarih', 'transaction_date', 'işlem tarihi', 'transaction_time'],
-            'category': ['category', 'kategori', 'type', 'tip'],
-            'description': ['description', 'açıklama', 'detay', 'details', 'memo']
-        }
-        
-        # Map columns automatically
-        column_mapping = {}
-        for standard_col, possible_names in possible_columns.items():
-            for col in df.columns:
-                if col.lower() in [name.lower() for name in possible_names]:
-                    column_mapping[standard_col] = col
-                    break
-        
-        # Ensure we have at least title and amount
-        if 'title' not in column_mapping or 'amount' not in column_mapping:
-            # If no mapping found, assume first few columns are title, amount, etc.
-            if len(df.columns) >= 2:
-                column_mapping['title'] = df.columns[0]
-                column_mapping['amount'] = df.columns[1]
-                if len(df.columns) >= 3:
-                    column_mapping['date'] = df.columns[2]
-            else:
-                raise HTTPException(status_code=400, detail="Could not identify title and amount columns")
+        contents, content_hash = await read_upload(file)
         
-        # Process and insert expenses
-        expenses_added = 0
-        errors = []
-        categories_assigned = {}
+        # A retried upload gets the first response back without parsing the file again
+        fingerprint = request_fingerprint(content_hash, force, import_id)
+        return await run_idempotent(
+            idempotency_key, "upload_csv", fingerprint,
+            lambda: run_import(contents, content_hash, file.filename, force=force, requested_id=import_id)
+        )
         
-        for index, row in df.iterrows():
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing CSV: {str(e)}")
+
+def expand_batch_upload(filename: str, contents: bytes, budget: Dict[str, int]):
+    """Yield (name, bytes) for an upload, unpacking ZIP archives member by member"""
+    if not filename.lower().endswith('.zip'):
+        budget['files'] -= 1
+        budget['bytes'] -= len(contents)
+        if budget['files'] < 0 or budget['bytes'] < 0:
+            raise HTTPException(status_code=413, detail="Batch upload is too large")
+        yield filename, contents
+        return
+    
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(contents))
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail=f"{filename} is not a valid ZIP archive")
+    with archive:
+        for info in archive.infolist():
+            base = os.path.basename(info.filename)
+            if info.is_dir() or info.filename.startswith('__MACOSX/') or not base or base.startswith('.'):
+                continue
+            # Check the declared sizes before inflating anything
+            budget['files'] -= 1
+            budget['bytes'] -= info.file_size
+            if budget['files'] < 0 or budget['bytes'] < 0:
+                raise HTTPException(status_code=413, detail="Batch upload is too large")
+            yield f"{filename}/{info.filename}", archive.read(info)
+
+# Import several statements (or ZIP archives of them) in one request
+@api_router.post("/upload/batch")
+async def upload_batch(
+    files: List[UploadFile] = File(...),
+    force: bool = False,
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Import CSV, Excel and PDF statements concurrently and return one consolidated report"""
+    budget = {'files': MAX_BATCH_FILES, 'bytes': MAX_BATCH_UNCOMPRESSED_BYTES}
+    members = []
+    content_hashes = []
+    for file in files:
+        contents, content_hash = await read_upload(file)
+        content_hashes.append(content_hash)
+        members.extend(expand_batch_upload(file.filename, contents, budget))
+    
+    fingerprint = request_fingerprint(force, *content_hashes)
+    return await run_idempotent(idempotency_key, "upload_batch", fingerprint, lambda: import_batch_members(members, force))
+
+async def import_batch_members(members, force: bool):
+    """Import expanded batch members through a shared worker pool and write sink"""
+    sink = ExpenseWriteSink()
+    workers = asyncio.Semaphore(BATCH_IMPORT_WORKERS)
+    
+    async def import_member(name: str, contents: bytes):
+        report = {"filename": name}
+        if not name.lower().endswith(SUPPORTED_EXTENSIONS):
+            return {**report, "status": "skipped", "error": "Unsupported file type"}
+        async with workers:
             try:
-                # Extract title
-                title = str(row[column_mapping['title']]).strip()
-                if pd.isna(row[column_mapping['title']]) or not title:
-                    continue
-                
-                # Clean title - remove amounts, dates, and bonus/miles text
-                # Remove common patterns that indicate amounts or bonuses
-                title = re.sub(r'\d+[.,]\d{2}.*', '', title)  # Remove amounts at end
-                title = re.sub(r'.*mil.*', '', title, flags=re.IGNORECASE)  # Remove miles
-                title = re.sub(r'.*bonus.*', '', title, flags=re.IGNORECASE)  # Remove bonus
-                title = re.sub(r'.*puan.*', '', title, flags=re.IGNORECASE)  # Remove points
-                
-                # Advanced Turkish bank statement cleaning for credit cards
-                # Remove KAZANILAN MAXIMIL and MAXIPUAN sections (İş Bankası format)
-                title = re.sub(r'KAZANILAN\s+MAXIMIL[:\s]*[\d,]+', '', title, flags=re.IGNORECASE)
-                title = re.sub(r'MAXIPUAN[:\s]*[\d,]+', '', title, flags=re.IGNORECASE)
-                title = re.sub(r'IPTAL\s+EDILEN\s+MAXIMIL[:\s]*[\d,]+', '', title, flags=re.IGNORECASE)
-                title = re.sub(r'IPTAL\s+EDILEN\s+MAXIPUAN[:\s]*[\d,]+', '', title, flags=re.IGNORECASE)
-                
-                # Remove other common Turkish bank reward program patterns
-                title = re.sub(r'WORLDPUAN[:\s]*[\d,]+', '', title, flags=re.IGNORECASE)
-                title = re.sub(r'BONUS[:\s]*[\d,]+', '', title, flags=re.IGNORECASE)
-                title = re.sub(r'MIL[:\s]*[\d,]+', '', title, flags=re.IGNORECASE)
-                
-                # Remove installment information in Turkish format
-                title = re.sub(r'\(\d+/\d+\s*TK\)', '', title)  # (1/3 TK) format
-                title = re.sub(r'\d+/\d+\s*TK', '', title)  # 1/3 TK format
-                title = re.sub(r'\d+/\d+.*', '', title)  # Remove installment info
-                title = re.sub(r'\(\d+/\d+.*\)', '', title)  # Remove installment in parentheses
-                
-                # Remove dates and extra text
-                title = re.sub(r'^\d+[./]\d+[./]\d+', '', title)  # Remove dates at start
-                title = re.sub(r'\d+\s*USD', '', title)  # Remove USD amounts
-                title = re.sub(r'[\d,]+\s*TL', '', title)  # Remove TL amounts in description
-                
-                # Clean up location codes (TR, DE, GB etc)
-                title = re.sub(r'\s+[A-Z]{2}\s*$', '', title)  # Remove country codes at end
-                
-                # Clean extra spaces and characters
-                title = re.sub(r'\s+', ' ', title).strip()  # Clean extra spaces
-                title = re.sub(r'^[*\-\s]+|[*\-\s]+$', '', title)  # Remove leading/trailing special chars
-                
-                # Skip if title becomes too short or empty
-                if len(title) < 3:
-                    continue
-                
-                # Enhanced amount extraction for Turkish bank statements
-                amount_val = row[column_mapping['amount']]
-                if pd.isna(amount_val):
-                    continue
-                
-                # Handle different amount formats - Turkish bank specific
-                amount_str = str(amount_val).strip()
-                
-                # SIMPLIFIED POINTS FILTERING: Only filter very obvious small amounts
-                # Check if this is likely a points/bonus transaction
-                original_title = str(row[column_mapping['title']]).upper()
-                if ('MAXIMIL' in original_title or 'MAXIPUAN' in original_title):
-                    # Only filter if the amount is clearly a small point value
-                    test_amount_str = amount_str.replace('-', '').replace('+', '').strip()
-                    
-                    # Filter only very obvious small amounts
-                    if test_amount_str in ['0,46', '3,09', '1,28', '0,15', '0,16', '2,15']:
-                        continue  # Skip obvious point values
-                    
-                    # For simple decimal amounts under 10 TL, check if it's likely points
-                    if ('.' not in test_amount_str and ',' in test_amount_str and 
-                        len(test_amount_str) <= 4):
-                        try:
-                            simple_amount = float(test_amount_str.replace(',', '.'))
-                            if simple_amount < 10:
-                                continue  # Skip small amounts that are likely points
-                        except:
-                            pass  # If parsing fails, continue with main logic
-                
-                # Remove currency symbols and negative signs for processing
-                amount_str = re.sub(r'[₺TL]', '', amount_str)  # Remove currency symbols
-                is_negative = '-' in amount_str or '+' not in amount_str  # Most expenses are negative/without +
-                amount_str = amount_str.replace('-', '').replace('+', '').strip()
-                
-                # Handle Turkish number format variations
-                if ',' in amount_str and '.' in amount_str:
-                    # Format like: 1.234,50 OR 1,234.50
-                    if amount_str.rfind(',') > amount_str.rfind('.'):
-                        # Format: 1.234,50 (German/Turkish style)
-                        parts = amount_str.split(',')
-                        if len(parts) == 2 and len(parts[1]) == 2:  # Has decimal part
-                            amount_str = parts[0].replace('.', '') + '.' + parts[1]
-                        else:
-                            amount_str = amount_str.replace(',', '')
-                    else:
-                        # Format: 1,234.50 (US style)
-                        amount_str = amount_str.replace(',', '')
-                elif ',' in amount_str and '.' not in amount_str:
-                    # Format: 234,50 (Turkish decimal style)
-                    if len(amount_str.split(',')[1]) == 2:  # Has decimal part
-                        amount_str = amount_str.replace(',', '.')
-                    else:
-                        amount_str = amount_str.replace(',', '')  # Thousands separator
-                elif '.' in amount_str and ',' not in amount_str:
-                    # Could be decimal (234.50) or thousands (1.234)
-                    decimal_part = amount_str.split('.')[-1]
-                    if len(decimal_part) == 2:
-                        pass  # Keep as is - it's decimal
-                    else:
-                        amount_str = amount_str.replace('.', '')  # It's thousands separator
-                
-                # Clean any remaining spaces and extract numeric value
-                amount_str = re.sub(r'\s+', '', amount_str)
-                amount_match = re.search(r'^(\d+\.?\d*)$', amount_str)
-                
-                if amount_match:
-                    try:
-                        amount = float(amount_match.group(1))
-                        # Ensure reasonable amount range for expenses
-                        if amount < 0.5:  # Less than 50 kuruş, likely a points value
-                            continue
-                        if amount > 100000:  # More than 100k TL, might be a balance or error
-                            if amount > 1000000:  # More than 1M, definitely skip
-                                continue
-                    except ValueError:
-                        continue
-                else:
-                    continue
-                
-                # Extract description
-                description = ""
-                if 'description' in column_mapping and pd.notna(row[column_mapping['description']]):
-                    description = str(row[column_mapping['description']]).strip()
-                
-                # Extract date
-                expense_date = date.today().isoformat()
-                if 'date' in column_mapping and pd.notna(row[column_mapping['date']]):
-                    try:
-                        parsed_date = pd.to_datetime(row[column_mapping['date']])
-                        expense_date = parsed_date.date().isoformat()
-                    except:
-                        pass
-                
-                # Smart categorization
-                if 'category' in column_mapping and pd.notna(row[column_mapping['category']]):
-                    # Use provided category if valid
-                    provided_category = str(row[column_mapping['category']]).lower()
-                    valid_categories = [cat["id"] for cat in EXPENSE_CATEGORIES]
-                    category = provided_category if provided_category in valid_categories else smart_categorize(title, description)
-                else:
-                    # Auto-categorize
-                    category = smart_categorize(title, description)
-                
-                # Track categorization
-                if category not in categories_assigned:
-                    categories_assigned[category] = []
-                categories_assigned[category].append(title)
-                
-                expense_data = {
-                    'title': title,
-                    'amount': amount,
-                    'category': category,
-                    'description': description if description else None,
-                    'date': expense_date
-                }
-                
-                expense_obj = Expense(**expense_data)
-                expense_doc = expense_obj.dict()
-                expense_doc['created_at'] = expense_obj.created_at.isoformat()
-                
-                await db.expenses.insert_one(expense_doc)
-                expenses_added += 1
-                
+                content_hash = hashlib.sha256(contents).hexdigest()
+                result = await run_import(contents, content_hash, os.path.basename(name), force=force, sink=sink)
+            except HTTPException as e:
+                return {**report, "status": "failed", "error": e.detail}
             except Exception as e:
-                errors.append(f"Row {index + 1}: {str(e)}")
-        
-        return {
-            "message": f"Successfully imported {expenses_added} expenses",
-            "total_rows": len(df),
-            "imported": expenses_added,
-            "errors": errors,
-            "auto_categorization": categories_assigned,
-            "detected_columns": column_mapping
-        }
+                return {**report, "status": "failed", "error": str(e)}
+        status = "already_imported" if result["already_imported"] else "imported"
+        return {**report, "status": status, **result}
+    
+    reports = await asyncio.gather(*(import_member(name, contents) for name, contents in members))
+    
+    categories = {}
+    for report in reports:
+        if report["status"] != "imported":
+            continue
+        for category, summary in report.get("auto_categorization", {}).items():
+            entry = categories.setdefault(category, {"count": 0, "sample": []})
+            entry["count"] += summary["count"]
+            entry["sample"] = (entry["sample"] + summary["sample"])[:SUMMARY_SAMPLE_SIZE]
+    
+    imported_reports = [r for r in reports if r["status"] == "imported"]
+    total_imported = sum(r["imported"] for r in imported_reports)
+    return {
+        "message": f"Imported {total_imported} expenses from {len(imported_reports)} of {len(reports)} files",
+        "files": len(reports),
+        "imported": total_imported,
+        "duplicates_skipped": sum(r["duplicates_skipped"] for r in imported_reports),
+        "error_count": sum(r["error_count"] for r in imported_reports),
+        "failed_files": sum(1 for r in reports if r["status"] == "failed"),
+        "auto_categorization": categories,
+        "results": reports
+    }
+
+# Live import progress
+@api_router.get("/imports/{import_id}/progress")
+async def stream_import_progress(import_id: str):
+    """Server-Sent Events with the counters of a running import, one event per batch"""
+    async def events():
+        progress = await wait_for_progress(import_id, PROGRESS_SUBSCRIBE_TIMEOUT)
+        if progress is None:
+            # Already finished (or never started): report what is stored
+            record = await db.imports.find_one({"id": import_id}, {"_id": 0, "status": 1, "result": 1})
+            if record:
+                payload = {"import_id": import_id, "status": record['status'], **record.get('result', {})}
+            else:
+                payload = {"import_id": import_id, "status": "not_found"}
+            yield f"event: progress\ndata: {json.dumps(payload)}\n\n"
+            return
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing CSV: {str(e)}")
+        version = None
+        while True:
+            if progress.version != version:
+                version = progress.version
+                yield f"event: progress\ndata: {json.dumps(progress.snapshot())}\n\n"
+                if progress.status != "running":
+                    return
+            try:
+                await progress.wait_for_change(version, PROGRESS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Page through the rows of an import
+@api_router.get("/imports/{import_id}/rows")
+async def get_import_rows(
+    import_id: str,
+    kind: str = "imported",
+    category: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+):
+    """Full detail behind an upload summary: imported expenses, skipped duplicates or errors"""
+    if kind not in IMPORT_ROW_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(IMPORT_ROW_KINDS)}")
+    if not await db.imports.find_one({"id": import_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Import not found")
+    skip = max(skip, 0)
+    limit = max(1, min(limit, MAX_IMPORT_ROWS_PAGE))
+    
+    if kind == "imported":
+        collection = db.expenses
+        query = {"import_id": import_id}
+        if category:
+            query["category"] = category
+        projection = {"_id": 0, "import_row": 1, "id": 1, "title": 1, "amount": 1, "category": 1, "date": 1}
+        sort_field = "import_row"
+    else:
+        collection = db.import_issues
+        query = {"import_id": import_id, "kind": kind}
+        projection = {"_id": 0, "import_id": 0, "kind": 0}
+        sort_field = "row"
+    
+    total = await collection.count_documents(query)
+    items = await collection.find(query, projection).sort(sort_field, 1).skip(skip).limit(limit).to_list(limit)
+    
+    return {
+        "import_id": import_id,
+        "kind": kind,
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+        "items": items
+    }
+
+# Roll back an import
+@api_router.delete("/imports/{import_id}")
+async def delete_import(import_id: str):
+    """Delete every expense added by one import in a single delete_many"""
+    import_record = await db.imports.find_one(
+        {"id": import_id}, {"_id": 0, "status": 1, "heartbeat_at": 1, "created_at": 1}
+    )
+    if not import_record:
+        raise HTTPException(status_code=404, detail="Import not found")
+    # A live import would keep inserting rows and then mark itself completed
+    if import_record['status'] == "running" and not import_is_stale(import_record):
+        raise HTTPException(status_code=409, detail="Import is still running")
+    
+    result = await db.expenses.delete_many({"import_id": import_id})
+    await db.import_issues.delete_many({"import_id": import_id})
+    
+    # A rolled back file no longer counts as imported, so it can be uploaded again
+    await db.imports.update_one(
+        {"id": import_id},
+        {"$set": {
+            "status": "rolled_back",
+            "rolled_back_count": result.deleted_count,
+            "rolled_back_at": datetime.utcnow().isoformat()
+        }}
+    )
+    record_write()
+    
+    return {
+        "message": f"Import rolled back, {result.deleted_count} expenses deleted",
+        "deleted_count": result.deleted_count
+    }
 
 # Update expense category
 @api_router.put("/expenses/{expense_id}/category")
@@ -807,21 +1450,20 @@ async def update_expense_category(expense_id: str, category_data: dict):
     new_category = category_data.get('category')
     
     # Validate category
-    valid_categories = [cat["id"] for cat in EXPENSE_CATEGORIES]
-    if new_category not in valid_categories:
+    if new_category not in VALID_CATEGORY_IDS:
         raise HTTPException(status_code=400, detail="Invalid category")
     
-    # Update expense
-    result = await db.expenses.update_one(
-        {"id": expense_id}, 
-        {"$set": {"category": new_category}}
+    previous = await db.expenses.find_one_and_update(
+        {"id": expense_id},
+        {"$set": {"category": new_category, "category_source": "user"}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
     )
-    
-    if result.matched_count == 0:
+    if not previous:
         raise HTTPException(status_code=404, detail="Expense not found")
+    updated_expense = {**previous, "category": new_category}
+    record_write([expense_scope(previous), expense_scope(updated_expense)])
     
-    # Get updated expense
-    updated_expense = await db.expenses.find_one({"id": expense_id})
     if isinstance(updated_expense.get('created_at'), str):
         updated_expense['created_at'] = datetime.fromisoformat(updated_expense['created_at'])
     
@@ -905,66 +1547,66 @@ async def set_expense_limit(limit_data: dict):
         "limits": limit_data,
         "created_at": datetime.utcnow().isoformat()
     })
+    # Limits feed the analytics only; no expense changed
+    record_write([])
     return {"message": "Expense limits set successfully", "limits": limit_data}
 
 @api_router.get("/expenses/limits/check")
 async def check_expense_limits():
     """Check if current month expenses exceed limits"""
-    # Get current month
-    now = datetime.utcnow()
-    month_start = now.replace(day=1).date().isoformat()
-    month_end = now.replace(day=31).date().isoformat() if now.month != 12 else now.replace(month=12, day=31).date().isoformat()
-    
-    # Get current month expenses
-    current_month_expenses = await db.expenses.find({
-        "date": {"$gte": month_start, "$lte": month_end}
-    }).to_list(1000)
-    
-    # Calculate current spending by category
-    current_spending = {}
-    for expense in current_month_expenses:
-        category = expense['category']
-        if category not in current_spending:
-            current_spending[category] = 0
-        current_spending[category] += expense['amount']
-    
-    # Get latest limits
-    latest_limits = await db.expense_limits.find().sort("created_at", -1).limit(1).to_list(1)
-    
-    warnings = []
-    if latest_limits:
-        limits = latest_limits[0]['limits']
-        for category, limit in limits.items():
-            current = current_spending.get(category, 0)
-            if current > limit:
-                category_info = next((cat for cat in EXPENSE_CATEGORIES if cat['id'] == category), None)
-                warnings.append({
-                    "category": category,
-                    "category_name": category_info['name'] if category_info else category,
-                    "icon": category_info['icon'] if category_info else '⚠️',
-                    "current": current,
-                    "limit": limit,
-                    "exceeded_by": current - limit,
-                    "percentage": (current / limit) * 100
-                })
-            elif current > limit * 0.8:  # 80% warning
-                category_info = next((cat for cat in EXPENSE_CATEGORIES if cat['id'] == category), None)
-                warnings.append({
-                    "category": category,
-                    "category_name": category_info['name'] if category_info else category,
-                    "icon": category_info['icon'] if category_info else '⚠️',
-                    "current": current,
-                    "limit": limit,
-                    "warning_type": "approaching_limit",
-                    "percentage": (current / limit) * 100
-                })
-    
-    return {
-        "current_spending": current_spending,
-        "warnings": warnings,
-        "month": f"{now.strftime('%B %Y')}",
-        "total_spent": sum(current_spending.values())
-    }
+    async def compute(now):
+        facets = await run_analytics_facets(["whole_month_by_category"], now)
+        return build_limit_check(facets["whole_month_by_category"], await find_latest_limits(), now)
+    return await cached_analytics("limits", compute)
+
+# Everything the dashboard shows on load, in one request
+@api_router.get("/dashboard")
+async def get_dashboard():
+    """Summary, monthly, trends, insights, predictions and limits from one aggregation"""
+    async def compute(now):
+        facets = await run_analytics_facets(list(analytics_facets(now)), now)
+        return {
+            "summary": build_expense_stats(facets["by_category"]),
+            "monthly": build_monthly_stats(facets["by_month_category"]),
+            "trends": build_trend_stats(facets["by_month_category"]),
+            "insights": build_insights(facets["insights_by_month_category"], now),
+            "predictions": build_predictions(facets["history_by_month_category"], now),
+            "limits": build_limit_check(facets["whole_month_by_category"], await find_latest_limits(), now)
+        }
+    return await cached_analytics("dashboard", compute)
+
+# Analytics cache hit rate and size
+@api_router.get("/metrics/cache")
+async def get_cache_metrics():
+    return {"analytics": analytics_cache.metrics(), "filter": filter_cache.metrics()}
+
+# Conditional GETs: ETags change whenever a write bumps the data version, so an
+# unchanged resource is answered with 304 before any query runs.
+# Defined before CORS so that CORS headers are added to 304 responses too.
+ETAG_EXCLUDED_SUFFIXES = ("/progress", "/metrics/cache")
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+@app.middleware("http")
+async def conditional_get(request: Request, call_next):
+    path = request.url.path
+    if request.method != "GET" or not path.startswith("/api") or path.endswith(ETAG_EXCLUDED_SUFFIXES):
+        return await call_next(request)
+    
+    # Taken before the handler runs: a write landing meanwhile only makes this ETag stale
+    # Insights and predictions depend on today's date as well
+    etag = data_version.etag(path, sorted(request.query_params.multi_items()), date.today().isoformat())
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    
+    response = await call_next(request)
+    if response.status_code == 200:
+        response.headers["ETag"] = etag
+        # Browsers revalidate every time and reuse their copy on 304
+        response.headers["Cache-Control"] = "no-cache"
+    return response
 
 app.add_middleware(
     CORSMiddleware,
@@ -984,6 +1626,38 @@ logger = logging.getLogger(__name__)
 # Include the router in the main app (MUST be after all endpoint definitions)
 app.include_router(api_router)
 
+@app.on_event("startup")
+async def create_indexes():
+    # Every single-expense read and write looks the document up by id
+    await db.expenses.create_index("id")
+    await db.idempotency_keys.create_index([("key", 1), ("endpoint", 1)], unique=True)
+    await db.idempotency_keys.create_index("created_at", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
+    await db.imports.create_index("id", unique=True)
+    await db.imports.create_index([("content_hash", 1), ("created_at", -1)])
+    await db.expenses.create_index([("import_id", 1), ("import_row", 1)], sparse=True)
+    await db.expenses.create_index("date")
+    await db.maintenance_runs.create_index([("task", 1), ("status", 1)])
+    await db.import_issues.create_index([("import_id", 1), ("kind", 1), ("row", 1)])
+    # Only imported expenses carry a dedup_key; manual entries may legitimately repeat
+    await db.expenses.create_index(
+        "dedup_key",
+        unique=True,
+        partialFilterExpression={"dedup_key": {"$exists": True}}
+    )
+
+@app.on_event("startup")
+async def start_expense_group_commit():
+    if EXPENSE_GROUP_COMMIT:
+        expense_group_commit.start()
+
+@app.on_event("startup")
+async def watch_data_version():
+    # Picks up writes made by the CLI
+    data_version.start_watching(db.meta)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Creates still queued are written before the connection goes away
+    await expense_group_commit.close()
+    await data_version.stop_watching()
     client.close()
\ No newline at end of file
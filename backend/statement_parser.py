@@ -0,0 +1,573 @@
+"""Helpers for reading uploaded bank statements"""
+import codecs
+import hashlib
+import io
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional, Pattern, Tuple
+
+import pandas as pd
+from PyPDF2 import PdfReader
+
+# Only this much of an upload is inspected when guessing its encoding
+ENCODING_SNIFF_BYTES = 64 * 1024
+
+BOM_ENCODINGS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# Single-byte Turkish codecs, in the order they used to be tried
+LEGACY_TURKISH_ENCODINGS = ['iso-8859-9', 'windows-1254']
+
+TURKISH_LETTERS = set('çğıöşüÇĞİÖŞÜ')
+NON_ASCII_PATTERN = re.compile(rb'[\x80-\xff]')
+
+
+def detect_encoding(data, sample_size=ENCODING_SNIFF_BYTES, partial=False):
+    """Pick a codec for an uploaded file by looking at a bounded prefix of its bytes.
+
+    partial means data is itself only the start of the file, e.g. a preview.
+    """
+    sample = data[:sample_size]
+
+    for bom, encoding in BOM_ENCODINGS:
+        if sample.startswith(bom):
+            return encoding
+
+    # A multi-byte character may be cut at the end of the sample, so only
+    # treat the sample as final when it is the whole file
+    final = not partial and len(data) <= sample_size
+
+    # An ASCII prefix says nothing about the rest, so sniff from the first non-ASCII byte
+    if len(data) > sample_size and sample.isascii():
+        match = NON_ASCII_PATTERN.search(data, sample_size)
+        if match is None:
+            return 'utf-8'
+        sample = data[match.start():match.start() + sample_size]
+        final = not partial and match.start() + sample_size >= len(data)
+
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=final)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+
+    # Both Turkish codecs agree on 0xA0-0xFF; they only differ in 0x80-0x9F where
+    # iso-8859-9 has C1 control characters and windows-1254 has punctuation.
+    # Score each by Turkish letter frequency and penalise control characters.
+    best_encoding, best_score = LEGACY_TURKISH_ENCODINGS[0], None
+    for encoding in LEGACY_TURKISH_ENCODINGS:
+        try:
+            text = sample.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+        turkish = sum(1 for ch in text if ch in TURKISH_LETTERS)
+        controls = sum(1 for ch in text if '\x80' <= ch <= '\x9f')
+        score = turkish - 4 * controls
+        if best_score is None or score > best_score:
+            best_encoding, best_score = encoding, score
+    return best_encoding
+
+
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.xls', '.pdf')
+
+# Turkish credit card statement lines in PDFs, e.g.
+# "25.02.2025 METRO UMRANIYE TEKEL ISTANBUL TR KAZANILAN MAXIMIL:3,09 MAXIPUAN:0,46 1,544.14-"
+PDF_LINE_PATTERN = re.compile(r'(\d{1,2}[./]\d{1,2}[./]\d{4})\s+(.*?)\s+([\d,.-]+)\s*$')
+PDF_SKIP_WORDS = ['ISLEM TARIHI', 'ACIKLAMA', 'TUTAR', 'HESAP OZETI', 'SON ODEME']
+PDF_COLUMNS = ['İşlem Tarihi', 'Açıklama', 'Tutar']
+
+
+def read_statement_pdf(contents):
+    """Extract transaction lines from a PDF statement into a date/description/amount frame"""
+    reader = PdfReader(io.BytesIO(contents))
+    text = "\n".join(page.extract_text() or "" for page in reader.pages)
+
+    rows = []
+    for line in text.split('\n'):
+        line = line.strip()
+        # Skip header and footer lines
+        if not line or any(skip_word in line.upper() for skip_word in PDF_SKIP_WORDS):
+            continue
+        match = PDF_LINE_PATTERN.match(line)
+        if match:
+            rows.append(match.groups())
+    return pd.DataFrame(rows, columns=PDF_COLUMNS)
+
+
+def read_statement(contents, filename, nrows=None, start_row=0, partial=False):
+    """Load a CSV, Excel or PDF statement into a DataFrame, chosen by file extension.
+
+    The first start_row data rows are dropped. They are counted the way
+    pandas numbers data rows (blank lines do not count), matching the
+    row numbers import checkpoints are stored with. partial marks contents
+    as only the first bytes of a CSV, whose last character may be cut off.
+    """
+    extension = filename.lower().rsplit('.', 1)[-1]
+    read_rows = start_row + nrows if nrows is not None else None
+    if extension == 'csv':
+        # Sniff the encoding once and let pandas decode straight from the bytes
+        encoding = detect_encoding(contents, partial=partial)
+        # A character cut at the end of a partial read sits past the rows asked for
+        df = pd.read_csv(
+            io.BytesIO(contents), encoding=encoding, nrows=read_rows,
+            encoding_errors='replace' if partial else 'strict'
+        )
+    elif extension in ('xlsx', 'xls'):
+        df = pd.read_excel(io.BytesIO(contents), nrows=read_rows)
+    elif extension == 'pdf':
+        df = read_statement_pdf(contents)
+    else:
+        raise ValueError(f"Unsupported file type: {filename}")
+    df = df.iloc[start_row:]
+    return df.head(nrows) if nrows is not None else df
+
+
+# Common CSV formats: date, description, amount OR transaction_date, merchant, amount
+COLUMN_ALIASES = {
+    'title': ['description', 'merchant', 'title', 'açıklama', 'işlem açıklaması', 'merchant_name'],
+    'amount': ['amount', 'tutar', 'miktar', 'toplam', 'total', 'transaction_amount'],
+    'date': ['date', 'tarih', 'transaction_date', 'işlem tarihi', 'transaction_time'],
+    'category': ['category', 'kategori', 'type', 'tip'],
+    'description': ['description', 'açıklama', 'detay', 'details', 'memo']
+}
+
+STANDARD_COLUMNS = ['title', 'amount', 'description', 'date', 'category']
+
+
+def normalize_header(name):
+    """Lowercase a column header so 'İşlem Tarihi' and 'işlem tarihi' compare equal"""
+    return str(name).replace('İ', 'i').strip().lower()
+
+
+ALIAS_SETS = {
+    standard_col: {normalize_header(name) for name in names}
+    for standard_col, names in COLUMN_ALIASES.items()
+}
+
+# Title clean-up shared by every profile, applied in order after the profile's own patterns
+BASE_TITLE_PATTERNS = [
+    # Remove common patterns that indicate amounts or bonuses
+    (re.compile(r'\d+[.,]\d{2}.*'), ''),  # Remove amounts at end
+    (re.compile(r'.*mil.*', re.IGNORECASE), ''),  # Remove miles
+    (re.compile(r'.*bonus.*', re.IGNORECASE), ''),  # Remove bonus
+    (re.compile(r'.*puan.*', re.IGNORECASE), ''),  # Remove points
+
+    # Remove installment information in Turkish format
+    (re.compile(r'\(\d+/\d+\s*TK\)'), ''),  # (1/3 TK) format
+    (re.compile(r'\d+/\d+\s*TK'), ''),  # 1/3 TK format
+    (re.compile(r'\d+/\d+.*'), ''),  # Remove installment info
+    (re.compile(r'\(\d+/\d+.*\)'), ''),  # Remove installment in parentheses
+
+    # Remove dates and extra text
+    (re.compile(r'^\d+[./]\d+[./]\d+'), ''),  # Remove dates at start
+    (re.compile(r'\d+\s*USD'), ''),  # Remove USD amounts
+    (re.compile(r'[\d,]+\s*TL'), ''),  # Remove TL amounts in description
+
+    # Clean up location codes (TR, DE, GB etc)
+    (re.compile(r'\s+[A-Z]{2}\s*$'), ''),  # Remove country codes at end
+
+    # Clean extra spaces and characters
+    (re.compile(r'\s+'), ' '),
+]
+EDGE_CHARS_PATTERN = re.compile(r'^[*\-\s]+|[*\-\s]+$')
+
+CURRENCY_PATTERN = re.compile(r'[₺TL]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+AMOUNT_PATTERN = re.compile(r'^(\d+\.?\d*)$')
+
+# Turkish statements are day-first; month-first is only tried when nothing else fits
+DATE_FORMATS = [
+    '%d.%m.%Y', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%y', '%d/%m/%y',
+    '%Y-%m-%d', '%Y/%m/%d', '%Y.%m.%d',
+    '%d.%m.%Y %H:%M', '%d.%m.%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S',
+    '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S',
+    '%m/%d/%Y',
+]
+# Number of date values a format has to parse before it is used for the whole column
+DATE_SAMPLE_ROWS = 50
+DATE_FORMAT_MIN_MATCH = 0.8
+
+
+class InvalidDate(str):
+    """A date cell that could not be parsed"""
+
+
+def is_month_first(date_format):
+    """True for formats like %m/%d/%Y that read the same strings as a day-first format differently"""
+    return not date_format.startswith('%Y') and 0 <= date_format.find('%m') < date_format.find('%d')
+
+
+def infer_date_format(sample, preferred=()):
+    """Return the format that parses most sampled date strings, or None if none fits well.
+
+    Preferred (e.g. remembered) formats are tried first, except month-first
+    ones: those only get their turn after every day-first format, so a
+    format remembered from one file never flips 01/02 to January 2nd for the next.
+    """
+    if not sample:
+        return None
+    sample = pd.Series(sample, dtype=object)
+    best_format, best_count = None, 0
+    tried = set()
+    preferred = [date_format for date_format in preferred if date_format]
+    candidates = (
+        [date_format for date_format in preferred if not is_month_first(date_format)]
+        + DATE_FORMATS
+        + [date_format for date_format in preferred if is_month_first(date_format)]
+    )
+    for date_format in candidates:
+        if not date_format or date_format in tried:
+            continue
+        tried.add(date_format)
+        count = int(pd.to_datetime(sample, format=date_format, errors='coerce').notna().sum())
+        if count == len(sample):
+            return date_format
+        if count > best_count:
+            best_format, best_count = date_format, count
+    # A few broken cells are flagged later; a format that misses more is a wrong guess
+    if best_count >= DATE_FORMAT_MIN_MATCH * len(sample):
+        return best_format
+    return None
+
+
+@dataclass
+class BankProfile:
+    """Layout and clean-up rules for one bank's statement export"""
+    id: str
+    name: str
+    # Normalized headers that must all be present for the profile to apply
+    required_headers: frozenset = frozenset()
+    # Seen in the raw transaction titles of this bank's statements
+    title_marker: Optional[Pattern] = None
+    # Reward program text stripped from titles before the shared clean-up
+    reward_patterns: List[Tuple[Pattern, str]] = field(default_factory=list)
+    # Amounts on reward lines that are point values rather than purchases
+    point_values: frozenset = frozenset()
+    point_limit: float = 0
+    date_format: Optional[str] = None
+    number_format: str = 'auto'  # 'auto', 'tr' (1.234,56) or 'us' (1,234.56)
+
+
+def _reward(pattern):
+    return (re.compile(pattern, re.IGNORECASE), '')
+
+
+BANK_PROFILES = [
+    BankProfile(
+        id='isbank_maximum',
+        name='İş Bankası Maximum',
+        title_marker=re.compile(r'MAXIMIL|MAXIPUAN', re.IGNORECASE),
+        reward_patterns=[
+            _reward(r'IPTAL\s+EDILEN\s+MAXIMIL[:\s]*[\d,]+'),
+            _reward(r'IPTAL\s+EDILEN\s+MAXIPUAN[:\s]*[\d,]+'),
+            _reward(r'KAZANILAN\s+MAXIMIL[:\s]*[\d,]+'),
+            _reward(r'MAXIMIL[:\s]*[\d,]+'),
+            _reward(r'MAXIPUAN[:\s]*[\d,]+'),
+        ],
+        point_values=frozenset(['0,46', '3,09', '1,28', '0,15', '0,16', '2,15']),
+        point_limit=10,
+    ),
+    BankProfile(
+        id='yapikredi_world',
+        name='Yapı Kredi World',
+        title_marker=re.compile(r'WORLDPUAN', re.IGNORECASE),
+        reward_patterns=[_reward(r'WORLDPUAN[:\s]*[\d,]+')],
+    ),
+    BankProfile(
+        id='garanti_bonus',
+        name='Garanti BBVA Bonus',
+        title_marker=re.compile(r'BONUS[:\s]*[\d,]+', re.IGNORECASE),
+        reward_patterns=[_reward(r'BONUS[:\s]*[\d,]+')],
+    ),
+    BankProfile(
+        # The layout produced by this app's own exports and test fixtures
+        id='expense_export',
+        name='Expense Tracker export',
+        required_headers=frozenset(['title', 'amount', 'date']),
+        date_format='%Y-%m-%d',
+        # These are also the generic English headers, so amounts may still be Turkish formatted
+        number_format='auto',
+    ),
+    BankProfile(id='generic', name='Generic statement'),
+]
+
+PROFILES_BY_ID = {profile.id: profile for profile in BANK_PROFILES}
+
+
+TURKISH_ASCII = str.maketrans('çğıöşüÇĞİÖŞÜ', 'cgiosuCGIOSU')
+NON_ALNUM_PATTERN = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_merchant(title):
+    """Canonical merchant name: ASCII-folded, lowercase, punctuation collapsed to spaces"""
+    return NON_ALNUM_PATTERN.sub(' ', title.translate(TURKISH_ASCII).lower()).strip()
+
+
+def transaction_key(expense_date, amount, merchant):
+    """Identity of an imported transaction: date, amount in kuruş and merchant"""
+    return f"{expense_date}|{int(round(amount * 100))}|{merchant}"
+
+
+def dedup_key(transaction, occurrence):
+    """Duplicate-detection key stored on imported expenses.
+
+    The occurrence number keeps two identical purchases on the same day in
+    one statement apart, while still matching them in an overlapping one.
+    """
+    return f"{transaction}|{occurrence}"
+
+
+def split_dedup_key(key):
+    """Inverse of dedup_key: (transaction key, occurrence)"""
+    transaction, _, occurrence = key.rpartition('|')
+    return transaction, int(occurrence)
+
+
+class StatementParser:
+    """A bank profile bound to one header layout, with its clean-up rules precompiled"""
+
+    def __init__(self, profile, column_mapping):
+        self.profile = profile
+        self.column_mapping = column_mapping
+        self.title_patterns = list(profile.reward_patterns) + BASE_TITLE_PATTERNS
+        # Date format last seen in a file with this layout
+        self.date_format = profile.date_format
+
+    def clean_title(self, title):
+        """Strip amounts, reward points, installments and location codes from a title"""
+        for pattern, replacement in self.title_patterns:
+            title = pattern.sub(replacement, title)
+        return EDGE_CHARS_PATTERN.sub('', title.strip())
+
+    def is_point_value(self, raw_title, amount_str):
+        """Whether a reward-line amount is a point value rather than a purchase"""
+        profile = self.profile
+        if not profile.point_limit or not profile.title_marker.search(raw_title):
+            return False
+
+        test_amount_str = amount_str.replace('-', '').replace('+', '').strip()
+        if test_amount_str in profile.point_values:
+            return True
+
+        # For simple decimal amounts under the limit, check if it's likely points
+        if '.' not in test_amount_str and ',' in test_amount_str and len(test_amount_str) <= 4:
+            try:
+                return float(test_amount_str.replace(',', '.')) < profile.point_limit
+            except ValueError:
+                return False
+        return False
+
+    def parse_amount(self, amount_str):
+        """Parse a Turkish/US formatted amount string, or return None"""
+        amount_str = CURRENCY_PATTERN.sub('', amount_str)
+        amount_str = amount_str.replace('-', '').replace('+', '').strip()
+
+        number_format = self.profile.number_format
+        if number_format == 'tr':
+            amount_str = amount_str.replace('.', '').replace(',', '.')
+        elif number_format == 'us':
+            amount_str = amount_str.replace(',', '')
+        elif ',' in amount_str and '.' in amount_str:
+            # Format like: 1.234,50 OR 1,234.50
+            if amount_str.rfind(',') > amount_str.rfind('.'):
+                # Format: 1.234,50 (German/Turkish style)
+                parts = amount_str.split(',')
+                if len(parts) == 2 and len(parts[1]) == 2:  # Has decimal part
+                    amount_str = parts[0].replace('.', '') + '.' + parts[1]
+                else:
+                    amount_str = amount_str.replace(',', '')
+            else:
+                # Format: 1,234.50 (US style)
+                amount_str = amount_str.replace(',', '')
+        elif ',' in amount_str:
+            # Format: 234,50 (Turkish decimal style)
+            if len(amount_str.split(',')[1]) == 2:  # Has decimal part
+                amount_str = amount_str.replace(',', '.')
+            else:
+                amount_str = amount_str.replace(',', '')  # Thousands separator
+        elif '.' in amount_str:
+            # Could be decimal (234.50) or thousands (1.234)
+            if len(amount_str.split('.')[-1]) != 2:
+                amount_str = amount_str.replace('.', '')  # It's thousands separator
+
+        amount_match = AMOUNT_PATTERN.search(WHITESPACE_PATTERN.sub('', amount_str))
+        if not amount_match:
+            return None
+        return float(amount_match.group(1))
+
+    def parse_dates(self, column):
+        """Parse a whole date column at once into ISO strings.
+
+        Missing values become None and unparseable ones InvalidDate, so the
+        caller can flag them instead of guessing a date.
+        """
+        if pd.api.types.is_datetime64_any_dtype(column):
+            parsed = column
+        else:
+            present = column.notna()
+            values = column.where(present, '').astype(str).str.strip()
+            present &= values != ''
+
+            sample = values[present].head(DATE_SAMPLE_ROWS).tolist()
+            date_format = infer_date_format(sample, [self.date_format, self.profile.date_format])
+            if date_format:
+                # Remember the format so the next file with this layout tries it first
+                self.date_format = date_format
+                parsed = pd.to_datetime(values.where(present), format=date_format, errors='coerce')
+            else:
+                parsed = pd.to_datetime(values.where(present), format='mixed', dayfirst=True, errors='coerce')
+
+        iso_dates = parsed.dt.strftime('%Y-%m-%d')
+        result = []
+        for raw, iso in zip(column.tolist(), iso_dates.tolist()):
+            if isinstance(iso, str):
+                result.append(iso)
+            elif pd.isna(raw) or str(raw).strip() == '':
+                result.append(None)
+            else:
+                result.append(InvalidDate(raw))
+        return result
+
+    def iter_rows(self, df):
+        """Yield (row_index, values) with one value per standard column, None when unmapped"""
+        columns = []
+        for standard_col in STANDARD_COLUMNS:
+            col = self.column_mapping.get(standard_col)
+            if col is None:
+                columns.append([None] * len(df))
+            elif standard_col == 'date':
+                columns.append(self.parse_dates(df[col]))
+            else:
+                columns.append(df[col].tolist())
+        return enumerate(zip(*columns))
+
+    def parse_row(self, values):
+        """Turn one statement row into expense fields, or None when it should be skipped"""
+        title_value, amount_value, description_value, date_value, category_value = values
+
+        if pd.isna(title_value):
+            return None
+        raw_title = str(title_value).strip()
+        title = self.clean_title(raw_title)
+        # Skip if title becomes too short or empty
+        if len(title) < 3:
+            return None
+
+        if pd.isna(amount_value):
+            return None
+        if isinstance(amount_value, (int, float)):
+            # pandas already parsed the column as numbers
+            amount = abs(float(amount_value))
+        else:
+            amount_str = str(amount_value).strip()
+            if self.is_point_value(raw_title.upper(), amount_str):
+                return None
+            amount = self.parse_amount(amount_str)
+            if amount is None:
+                return None
+
+        # Less than 50 kuruş is likely a points value, more than 1M TL a balance or error
+        if amount < 0.5 or amount > 1000000:
+            return None
+
+        description = ""
+        if description_value is not None and pd.notna(description_value):
+            description = str(description_value).strip()
+
+        if isinstance(date_value, InvalidDate):
+            raise ValueError(f"Unrecognized date '{date_value}'")
+        expense_date = date_value or date.today().isoformat()
+
+        category = None
+        if category_value is not None and pd.notna(category_value):
+            category = str(category_value).lower()
+
+        return {
+            'title': title,
+            'amount': amount,
+            'description': description,
+            'date': expense_date,
+            'category': category,
+        }
+
+
+# Header fingerprint -> (column mapping, ids of profiles whose headers match)
+DETECTION_CACHE_SIZE = 256
+_detection_cache = OrderedDict()
+_parser_cache: Dict[Tuple[str, str], StatementParser] = {}
+
+# Number of title values inspected when choosing between candidate profiles
+TITLE_SAMPLE_ROWS = 20
+
+
+def header_fingerprint(columns):
+    """Stable hash of a statement's header row"""
+    normalized = '\x1f'.join(normalize_header(col) for col in columns)
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def _detect_layout(columns):
+    normalized = [normalize_header(col) for col in columns]
+
+    column_mapping = {}
+    for standard_col, aliases in ALIAS_SETS.items():
+        for col, name in zip(columns, normalized):
+            if name in aliases:
+                column_mapping[standard_col] = col
+                break
+
+    # Ensure we have at least title and amount
+    if 'title' not in column_mapping or 'amount' not in column_mapping:
+        # If no mapping found, assume first few columns are title, amount, etc.
+        if len(columns) < 2:
+            raise ValueError("Could not identify title and amount columns")
+        column_mapping['title'] = columns[0]
+        column_mapping['amount'] = columns[1]
+        if len(columns) >= 3:
+            column_mapping['date'] = columns[2]
+
+    header_set = set(normalized)
+    candidates = [
+        profile.id for profile in BANK_PROFILES
+        if profile.required_headers <= header_set
+    ]
+    return column_mapping, candidates
+
+
+def detect_statement_format(df):
+    """Return the StatementParser for a statement, reusing earlier detection for known headers"""
+    columns = list(df.columns)
+    fingerprint = header_fingerprint(columns)
+
+    cached = _detection_cache.get(fingerprint)
+    if cached is None:
+        cached = _detect_layout(columns)
+        _detection_cache[fingerprint] = cached
+        if len(_detection_cache) > DETECTION_CACHE_SIZE:
+            _detection_cache.popitem(last=False)
+    else:
+        _detection_cache.move_to_end(fingerprint)
+    column_mapping, candidates = cached
+
+    # Banks sharing a header layout are told apart by their reward program markers
+    titles = df[column_mapping['title']].head(TITLE_SAMPLE_ROWS).dropna().astype(str).tolist()
+    profile = PROFILES_BY_ID['generic']
+    for profile_id in candidates:
+        candidate = PROFILES_BY_ID[profile_id]
+        if candidate.title_marker is None or any(candidate.title_marker.search(t) for t in titles):
+            profile = candidate
+            break
+
+    key = (fingerprint, profile.id)
+    parser = _parser_cache.get(key)
+    if parser is None:
+        parser = StatementParser(profile, column_mapping)
+        if len(_parser_cache) >= DETECTION_CACHE_SIZE:
+            _parser_cache.clear()
+        _parser_cache[key] = parser
+    return parser
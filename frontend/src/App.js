@@ -90,44 +90,25 @@ function App() {
     }
   };
 
-  // Fetch all stats
+  // Fetch all stats and smart features in one request
   const fetchAllStats = async () => {
     try {
-      const [statsResponse, monthlyResponse, trendsResponse] = await Promise.all([
-        axios.get(`${API}/expenses/stats/summary`),
-        axios.get(`${API}/expenses/stats/monthly`),
-        axios.get(`${API}/expenses/stats/trends`)
-      ]);
+      const { data } = await axios.get(`${API}/dashboard`);
       
-      setStats(statsResponse.data);
-      setMonthlyStats(monthlyResponse.data);
-      setTrendStats(trendsResponse.data);
+      setStats(data.summary);
+      setMonthlyStats(data.monthly);
+      setTrendStats(data.trends);
+      setInsights(data.insights.insights || []);
+      setPredictions(data.predictions.predictions || {});
+      setLimitWarnings(data.limits.warnings || []);
     } catch (error) {
-      console.error('Error fetching stats:', error);
-    }
-  };
-
-  // Fetch smart insights
-  const fetchSmartFeatures = async () => {
-    try {
-      const [insightsResponse, predictionsResponse, limitsResponse] = await Promise.all([
-        axios.get(`${API}/expenses/insights`),
-        axios.get(`${API}/expenses/predictions`),
-        axios.get(`${API}/expenses/limits/check`)
-      ]);
-      
-      setInsights(insightsResponse.data.insights || []);
-      setPredictions(predictionsResponse.data.predictions || {});
-      setLimitWarnings(limitsResponse.data.warnings || []);
-    } catch (error) {
-      console.error('Error fetching smart features:', error);
+      console.error('Error fetching dashboard:', error);
     }
   };
 
   useEffect(() => {
     fetchExpenses();
     fetchAllStats();
-    fetchSmartFeatures();
     // Initialize filtered expenses
     setFilteredExpenses(expenses);
     
@@ -408,9 +389,9 @@ function App() {
       
       if (response.data.auto_categorization) {
         statusMessage += '\n\n🤖 Otomatik Kategorilendirme:';
-        Object.entries(response.data.auto_categorization).forEach(([category, items]) => {
+        Object.entries(response.data.auto_categorization).forEach(([category, summary]) => {
           const categoryInfo = getCategoryInfo(category);
-          statusMessage += `\n${categoryInfo.icon} ${categoryInfo.name}: ${items.length} harcama`;
+          statusMessage += `\n${categoryInfo.icon} ${categoryInfo.name}: ${summary.count} harcama`;
         });
       }
 
@@ -423,8 +404,9 @@ function App() {
 
       if (response.data.errors && response.data.errors.length > 0) {
         statusMessage += `\n\n⚠️ Hatalar:\n${response.data.errors.slice(0, 3).join('\n')}`;
-        if (response.data.errors.length > 3) {
-          statusMessage += `\n... ve ${response.data.errors.length - 3} hata daha`;
+        const errorCount = response.data.error_count ?? response.data.errors.length;
+        if (errorCount > 3) {
+          statusMessage += `\n... ve ${errorCount - 3} hata daha`;
         }
       }
 
@@ -816,6 +798,9 @@ function App() {
                           <div className={`text-gray-500 ${isMobile ? 'text-xs' : 'text-sm'}`}>
                             Ort: {formatCurrency(prediction.historical_average)}
                           </div>
+                          <div className={`text-gray-400 ${isMobile ? 'text-xs' : 'text-sm'}`}>
+                            %{prediction.interval_level}: {formatCurrency(prediction.lower)} - {formatCurrency(prediction.upper)}
+                          </div>
                         </div>
                       </div>
                     </div>
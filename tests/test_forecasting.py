@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from forecasting import MIN_SEASONAL_MONTHS, SEASON_LENGTH, forecast_matrix, month_range, shift_month
+
+
+def test_single_observed_month_forecasts_that_month():
+    forecast = forecast_matrix(np.array([[0, 0, 0, 200.0]]), horizon=2)
+
+    assert forecast.point[0] == pytest.approx(200.0)
+    assert forecast.observed_months[0] == 1
+    # No error estimate yet, so the interval falls back to ±100% of the point
+    assert forecast.lower[0] == 0.0
+    assert forecast.upper[0] > 200.0
+
+
+def test_all_zero_row_forecasts_zero():
+    forecast = forecast_matrix(np.zeros((1, 12)), horizon=2)
+
+    assert forecast.point[0] == 0.0
+    assert forecast.lower[0] == 0.0
+    assert forecast.upper[0] == 0.0
+    assert forecast.observed_months[0] == 0
+    assert forecast.history_mean[0] == 0.0
+
+
+def test_leading_empty_months_do_not_pull_the_level_down():
+    forecast = forecast_matrix(np.array([[0, 0, 0, 0, 100.0, 100.0, 100.0, 100.0]]))
+
+    assert forecast.point[0] == pytest.approx(100.0)
+    assert forecast.history_mean[0] == pytest.approx(100.0)
+
+
+def test_seasonal_naive_is_chosen_for_a_strong_yearly_pattern():
+    season = np.array([100, 100, 100, 100, 100, 100, 100, 100, 100, 100, 100, 900.0])
+    matrix = np.tile(season, 3)[None, :]
+
+    forecast = forecast_matrix(matrix, horizon=SEASON_LENGTH)
+
+    assert forecast.method[0] == "seasonal_naive"
+    assert forecast.point[0] == pytest.approx(900.0)
+
+
+def test_seasonal_naive_needs_two_full_seasons():
+    season = np.array([100, 100, 100, 100, 100, 100, 100, 100, 100, 100, 100, 900.0])
+    matrix = np.tile(season, 2)[None, :MIN_SEASONAL_MONTHS - 1]
+
+    forecast = forecast_matrix(matrix, horizon=1)
+
+    assert forecast.method[0] == "exponential_smoothing"
+
+
+def test_seasonal_can_be_switched_off():
+    season = np.array([100, 100, 100, 100, 100, 100, 100, 100, 100, 100, 100, 900.0])
+    matrix = np.tile(season, 3)[None, :]
+
+    forecast = forecast_matrix(matrix, horizon=SEASON_LENGTH, seasonal=False)
+
+    assert forecast.method[0] == "exponential_smoothing"
+
+
+@pytest.mark.parametrize("horizon", [1, 2, 13])
+@pytest.mark.parametrize("level", [80, 95])
+def test_intervals_contain_the_point(horizon, level):
+    rng = np.random.default_rng(7)
+    matrix = rng.gamma(2.0, 500.0, size=(20, 30))
+    matrix[:5, :10] = 0  # categories that started later
+
+    forecast = forecast_matrix(matrix, horizon=horizon, level=level)
+
+    assert np.all(forecast.lower >= 0)
+    assert np.all(forecast.lower <= forecast.point)
+    assert np.all(forecast.point <= forecast.upper)
+
+
+def test_wider_level_gives_wider_interval():
+    rng = np.random.default_rng(3)
+    matrix = rng.gamma(2.0, 500.0, size=(5, 18))
+
+    narrow = forecast_matrix(matrix, level=80)
+    wide = forecast_matrix(matrix, level=95)
+
+    assert np.all(wide.upper - wide.point >= narrow.upper - narrow.point)
+
+
+@pytest.mark.parametrize("month_key, offset, expected", [
+    ("2024-01", -1, "2023-12"),
+    ("2024-12", 1, "2025-01"),
+    ("2024-05", -24, "2022-05"),
+    ("2024-05", 0, "2024-05"),
+])
+def test_shift_month(month_key, offset, expected):
+    assert shift_month(month_key, offset) == expected
+
+
+def test_month_range_ends_with_last_month():
+    assert month_range("2024-02", 3) == ["2023-12", "2024-01", "2024-02"]
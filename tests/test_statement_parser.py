@@ -0,0 +1,110 @@
+import pandas as pd
+import pytest
+
+from statement_parser import (
+    PROFILES_BY_ID, BankProfile, StatementParser, detect_statement_format, infer_date_format, is_month_first
+)
+
+
+def parser_for(number_format):
+    return StatementParser(BankProfile(id='test', name='Test', number_format=number_format), {})
+
+
+@pytest.mark.parametrize("number_format, raw, expected", [
+    ('tr', '1.234,56', 1234.56),
+    ('tr', '234,50', 234.5),
+    ('tr', '1.234.567,89', 1234567.89),
+    ('us', '1,234.56', 1234.56),
+    ('us', '234.50', 234.5),
+    ('us', '1,234,567.89', 1234567.89),
+    ('auto', '1.234,50', 1234.5),
+    ('auto', '1,234.50', 1234.5),
+    ('auto', '234,50', 234.5),
+    ('auto', '234.50', 234.5),
+    ('auto', '1.234', 1234.0),
+    ('auto', '-₺1.234,50', 1234.5),
+    ('auto', '120,75 TL', 120.75),
+    ('auto', '+99', 99.0),
+    ('auto', 'abc', None),
+    ('auto', '', None),
+])
+def test_parse_amount(number_format, raw, expected):
+    assert parser_for(number_format).parse_amount(raw) == expected
+
+
+@pytest.mark.parametrize("columns, titles, expected_profile", [
+    (['İşlem Tarihi', 'Açıklama', 'Tutar'], ['MIGROS KAZANILAN MAXIMIL:3,09'], 'isbank_maximum'),
+    (['İşlem Tarihi', 'Açıklama', 'Tutar'], ['SHELL WORLDPUAN:1,20'], 'yapikredi_world'),
+    (['İşlem Tarihi', 'Açıklama', 'Tutar'], ['A101 BONUS:0,50'], 'garanti_bonus'),
+    (['İşlem Tarihi', 'Açıklama', 'Tutar'], ['MIGROS ANTALYA AVM'], 'generic'),
+    (['title', 'amount', 'date'], ['Market'], 'expense_export'),
+    (['title', 'amount', 'category', 'description', 'date'], ['Market'], 'expense_export'),
+    (['description', 'amount', 'date'], ['Market'], 'generic'),
+])
+def test_profile_selection(columns, titles, expected_profile):
+    title_column = columns[1] if columns[0] == 'İşlem Tarihi' else columns[0]
+    df = pd.DataFrame({column: ['x'] * len(titles) for column in columns})
+    df[title_column] = titles
+
+    assert detect_statement_format(df).profile.id == expected_profile
+
+
+def test_export_profile_reads_turkish_amounts():
+    df = pd.DataFrame({'title': ['Migros', 'Shell'], 'amount': ['1.234,50', '234,50'], 'date': ['2025-01-01', '2025-01-02']})
+    parser = detect_statement_format(df)
+
+    amounts = [parser.parse_row(values)['amount'] for _, values in parser.iter_rows(df)]
+
+    assert amounts == [1234.5, 234.5]
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ('METRO UMRANIYE TEKEL ISTANBUL TR KAZANILAN MAXIMIL:3,09 MAXIPUAN:0,46', 'METRO UMRANIYE TEKEL ISTANBUL'),
+    ('MIGROS MAXIMIL: 1,28', 'MIGROS'),
+    ('IPTAL EDILEN MAXIMIL:2,15 SHELL', 'SHELL'),
+])
+def test_clean_title_strips_maximil_rewards(raw, expected):
+    parser = StatementParser(PROFILES_BY_ID['isbank_maximum'], {})
+
+    assert parser.clean_title(raw) == expected
+
+
+@pytest.mark.parametrize("raw_title, amount, expected", [
+    ('MIGROS MAXIMIL:3,09', '3,09', True),
+    ('MIGROS MAXIMIL:3,09', '-0,46', True),
+    ('MIGROS MAXIMIL:3,09', '234,50', False),
+    ('MIGROS', '3,09', False),
+])
+def test_maximil_point_values(raw_title, amount, expected):
+    parser = StatementParser(PROFILES_BY_ID['isbank_maximum'], {})
+
+    assert parser.is_point_value(raw_title, amount) == expected
+
+
+@pytest.mark.parametrize("sample, preferred, expected", [
+    # Ambiguous dates are day-first
+    (['01/02/2026', '03/02/2026'], (), '%d/%m/%Y'),
+    (['05.01.2022', '05.02.2022'], (), '%d.%m.%Y'),
+    # Month-first only when day-first cannot read the sample
+    (['12/25/2025', '01/02/2026'], (), '%m/%d/%Y'),
+    # A remembered month-first format does not win over day-first
+    (['01/02/2026', '03/02/2026'], ('%m/%d/%Y',), '%d/%m/%Y'),
+    (['12/25/2025'], ('%m/%d/%Y',), '%m/%d/%Y'),
+    # A remembered day-first format is tried first
+    (['2026-01-02'], ('%Y-%m-%d',), '%Y-%m-%d'),
+    (['01.02.26'], ('%d.%m.%y',), '%d.%m.%y'),
+    ([], (), None),
+    (['not a date', 'nope'], (), None),
+])
+def test_infer_date_format(sample, preferred, expected):
+    assert infer_date_format(sample, preferred) == expected
+
+
+@pytest.mark.parametrize("date_format, expected", [
+    ('%m/%d/%Y', True),
+    ('%d/%m/%Y', False),
+    ('%Y-%m-%d', False),
+    ('%d.%m.%Y %H:%M', False),
+])
+def test_is_month_first(date_format, expected):
+    assert is_month_first(date_format) == expected